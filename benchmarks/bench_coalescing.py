@@ -0,0 +1,133 @@
+"""
+Thundering-herd cost of /country-metrics with and without request coalescing,
+and the bounded response cache under a byte budget.
+
+For v2 and v3, sends ``--herd`` concurrent identical requests for each of
+``--keys`` (country, year) pairs whose response is not cached yet, and
+counts the transforms run (from the ``transform`` stage timings). With
+single-flight a herd costs one transform; without it, up to one per
+request. Then requests v3 partial trees with skewed popularity (a few
+countries and views are asked for far more than the rest) through a cache
+limited to ``--budget-kb`` and reports its hit/miss/eviction statistics.
+Run from the repository root:
+
+    python -m benchmarks.bench_coalescing [--herd 50] [--keys 20] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import warnings
+from typing import Dict, List
+
+import httpx
+
+from common.metrics import STAGE_LATENCY
+from common.offload import SingleFlight, run_blocking
+from common.response_cache import ResponseCache
+from .bench_endpoints import country_years
+from .harness import print_table
+
+PATHS = {
+    "v2": "/v2/country-metrics/{country}/{year}",
+    "v3": "/v3/country-metrics/{country}/{year}",
+}
+VIEWS = ["pillars=EP", "pillars=CP", "pillars=CF", "depth=area", "depth=indicator", "include_sources=false"]
+
+
+class Uncoalesced(SingleFlight):
+    """Runs every request's render, as the handlers did before single-flight"""
+
+    async def run(self, key, fn, *args):
+        return await run_blocking(fn, *args)
+
+
+async def herd(client, version: str, pairs: List[tuple], size: int, coalesce: bool) -> Dict:
+    import main
+    from common.datastore import get_dataset
+    state = get_dataset().derived[version]
+    flights, cache = state.render_flights, state.metrics_cache
+    if not coalesce:
+        state.render_flights = Uncoalesced(flights.name)
+    # An empty cache, so every herd starts with a miss
+    state.metrics_cache = ResponseCache(cache.name)
+
+    transforms = STAGE_LATENCY.count(version, "transform")
+    start = time.perf_counter()
+    try:
+        for country, year in pairs:
+            url = PATHS[version].format(country=country, year=year)
+            responses = await asyncio.gather(*(client.get(url) for _ in range(size)))
+            assert all(response.status_code == 200 for response in responses)
+    finally:
+        state.render_flights, state.metrics_cache = flights, cache
+    elapsed = time.perf_counter() - start
+
+    return {
+        "version": version,
+        "mode": "single-flight" if coalesce else "uncoalesced",
+        "requests": size * len(pairs),
+        "transforms": STAGE_LATENCY.count(version, "transform") - transforms,
+        "ms_per_herd": f"{elapsed / len(pairs) * 1000:.1f}",
+    }
+
+
+async def budget(client, pairs: List[tuple], budget_bytes: int, requests: int) -> Dict:
+    from common.datastore import get_dataset
+    state = get_dataset().derived["v3"]
+    cache = state.metrics_cache
+    state.metrics_cache = ResponseCache("v3_country_metrics", max_bytes=budget_bytes)
+
+    # The i-th most popular (view, country, year) is requested in proportion to 1/i
+    urls = [
+        PATHS["v3"].format(country=country, year=year) + "?" + view
+        for view in VIEWS for country, year in pairs
+    ]
+    random.Random(0).shuffle(urls)
+    weights = [1 / rank for rank in range(1, len(urls) + 1)]
+    try:
+        for url in random.Random(1).choices(urls, weights, k=requests):
+            await client.get(url)
+        return state.metrics_cache.stats()
+    finally:
+        state.metrics_cache = cache
+
+
+async def bench(herd_size: int, keys: int, budget_kb: int, budget_requests: int):
+    import main
+    main.warm_up()
+    pairs = country_years()
+
+    rows = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for version in PATHS:
+            for coalesce in (False, True):
+                rows.append(await herd(client, version, pairs[:keys], herd_size, coalesce))
+        stats = await budget(client, pairs, budget_kb * 1000, budget_requests)
+    return rows, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--herd", type=int, default=50, help="concurrent identical requests per key")
+    parser.add_argument("--keys", type=int, default=20, help="(country, year) pairs to send a herd for")
+    parser.add_argument("--budget-kb", type=int, default=500, help="byte budget of the cache in the replay")
+    parser.add_argument("--requests", type=int, default=5000, help="requests in the replay")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    rows, stats = asyncio.run(bench(args.herd, args.keys, args.budget_kb, args.requests))
+    print_table(rows, list(rows[0]))
+    print(f"\n{args.requests} requests for v3 partial trees through a {args.budget_kb} KB cache:")
+    print_table([stats], list(stats))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"herds": rows, "budget": stats}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Latency of cheap requests while heavy ones are running.
+
+Keeps ``--heavy`` clients requesting v1 /country-data (uncached pandas
+work on every request) while a probe requests ``/`` and a cached
+v3 /country-metrics body at a fixed interval. The run is repeated with the
+heavy work inline on the event loop (``threads=0``) and on work pools of
+different sizes, and reports the probe latency (measured from when each
+probe was due, so stalls of the event loop count), heavy throughput and the
+requests turned away with 503 by admission control. Run from the
+repository root:
+
+    python -m benchmarks.bench_concurrency [--threads 0 1 4] [--queue 64] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import time
+import warnings
+from typing import Dict, List
+
+import httpx
+
+from common import offload
+from .bench_endpoints import country_years, percentile
+from .harness import print_table
+
+PROBES = {
+    "root": "/",
+    "v3 cached": "/v3/country-metrics/{country}/{year}",
+}
+HEAVY = "/v1/v1/country-data/{country}/{year}"
+
+
+async def run_mode(
+    client: httpx.AsyncClient,
+    pairs: List[tuple],
+    duration: float,
+    heavy_clients: int,
+    probe_interval: float
+) -> Dict[str, float]:
+    stop = time.perf_counter() + duration
+    heavy_latencies: List[float] = []
+    rejected = 0
+    probe_latencies: Dict[str, List[float]] = {name: [] for name in PROBES}
+    country, year = pairs[0]
+
+    async def heavy(offset: int):
+        nonlocal rejected
+        i = offset
+        while time.perf_counter() < stop:
+            pair_country, pair_year = pairs[i % len(pairs)]
+            start = time.perf_counter()
+            response = await client.get(HEAVY.format(country=pair_country, year=pair_year))
+            if response.status_code == 503:
+                rejected += 1
+                await asyncio.sleep(0.01)
+            else:
+                heavy_latencies.append(time.perf_counter() - start)
+            i += heavy_clients
+
+    async def probe_once(name: str, due: float):
+        await client.get(PROBES[name].format(country=country, year=year))
+        probe_latencies[name].append(time.perf_counter() - due)
+
+    async def probe():
+        # Latency is counted from when the probe was due, so time spent
+        # waiting for a blocked event loop to run it is included
+        while time.perf_counter() < stop:
+            due = time.perf_counter() + probe_interval
+            await asyncio.sleep(probe_interval)
+            await asyncio.gather(*(probe_once(name, due) for name in PROBES))
+
+    started = time.perf_counter()
+    await asyncio.gather(probe(), *(heavy(i) for i in range(heavy_clients)))
+    elapsed = time.perf_counter() - started
+
+    heavy_latencies.sort()
+    result = {
+        "heavy_rps": len(heavy_latencies) / elapsed,
+        "heavy_p50_ms": percentile(heavy_latencies, 50) * 1000,
+        "rejected": rejected,
+    }
+    for name, latencies in probe_latencies.items():
+        latencies.sort()
+        result[f"{name} probes"] = len(latencies)
+        result[f"{name} p50_ms"] = percentile(latencies, 50) * 1000
+        result[f"{name} p99_ms"] = percentile(latencies, 99) * 1000
+        result[f"{name} max_ms"] = latencies[-1] * 1000 if latencies else float("nan")
+    return result
+
+
+async def bench(threads: List[int], queue: int, duration: float, heavy_clients: int, probe_interval: float):
+    import main
+    main.warm_up()
+    pairs = country_years()
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for size in threads:
+            offload.configure_pool(size, queue)
+            label = "inline" if size == 0 else f"pool {size}"
+            results[label] = await run_mode(client, pairs, duration, heavy_clients, probe_interval)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0, 1, 2, 4],
+                        help="work pool sizes to compare; 0 runs the heavy work inline")
+    parser.add_argument("--queue", type=int, default=64, help="tasks admitted beyond the running ones")
+    parser.add_argument("--heavy", type=int, default=16, help="concurrent clients sending heavy requests")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per mode")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    results = asyncio.run(bench(args.threads, args.queue, args.duration, args.heavy, args.probe_interval))
+
+    rows = [
+        {"mode": mode, **{key: f"{value:.2f}" if isinstance(value, float) else value for key, value in stats.items()}}
+        for mode, stats in results.items()
+    ]
+    print_table(rows, list(rows[0]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
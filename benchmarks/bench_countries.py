@@ -0,0 +1,77 @@
+"""
+Cost of resolving and suggesting countries with common.countries.
+
+Times ``CountryResolver.resolve`` on exact names, other spellings and
+unknown names, and ``suggest`` on prefixes of every length, against a
+linear scan of the normalized country names (what a client filtering the
+/countries list does). Run from the repository root:
+
+    python -m benchmarks.bench_countries [--number 20000] [--json out.json]
+"""
+import argparse
+import json
+import time
+import timeit
+import warnings
+from typing import Dict, List
+
+from common.countries import normalize
+from common.datastore import get_dataset
+from .harness import print_table
+
+
+def per_call_us(fn, inputs: List[str], number: int) -> float:
+    calls = max(number // len(inputs), 1)
+    seconds = min(timeit.repeat(lambda: [fn(value) for value in inputs], number=calls, repeat=3))
+    return seconds / (calls * len(inputs)) * 1e6
+
+
+def bench(number: int) -> List[Dict]:
+    resolver = get_dataset().country_resolver
+    names = sorted(resolver.iso_codes)
+    codes = [code for code in resolver.iso_codes.values() if code]
+    normalized = [(normalize(name), name) for name in names]
+
+    def scan(prefix: str) -> List[str]:
+        prefix = normalize(prefix)
+        return [name for key, name in normalized if key.startswith(prefix)][:10]
+
+    inputs = {
+        "exact name": names,
+        "lower-case name": [name.lower() for name in names],
+        "ISO code": [code.lower() for code in codes],
+        "unknown": [f"nowhere {i}" for i in range(len(names))],
+    }
+    prefixes = [name[:length] for name in names for length in (1, 3, 6)]
+
+    rows = [
+        {"operation": f"resolve {kind}", "inputs": len(values),
+         "index_us": f"{per_call_us(resolver.resolve, values, number):.2f}", "scan_us": "-"}
+        for kind, values in inputs.items()
+    ]
+    rows.append({
+        "operation": "suggest (prefix of 1, 3 and 6)",
+        "inputs": len(prefixes),
+        "index_us": f"{per_call_us(resolver.suggest, prefixes, number):.2f}",
+        "scan_us": f"{per_call_us(scan, prefixes, number):.2f}",
+    })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000, help="calls per timing")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    rows = bench(args.number)
+    print_table(rows, list(rows[0]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "countries", "time": time.time(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
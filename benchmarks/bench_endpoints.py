@@ -0,0 +1,208 @@
+"""
+Latency and throughput benchmark of the versioned country endpoints.
+
+Drives the app mounted in main.py in-process through an ASGI transport, or
+a running server with --url, requesting every (country, year) pair in the
+dataset. Also measures the cold-start import time and resident memory of
+main.py in a fresh interpreter. Run from the repository root:
+
+    python -m benchmarks.bench_endpoints --json results.json
+    python -m benchmarks.bench_endpoints --url http://127.0.0.1:8000
+    python -m benchmarks.bench_endpoints --compare before.json --json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+from typing import Dict, List, Optional
+
+import httpx
+
+from .harness import print_table
+
+ENDPOINTS = {
+    "v1 country-data": "/v1/v1/country-data/{country}/{year}",
+    "v2 country-data": "/v2/country-data/{country}/{year}",
+    "v2 country-metrics": "/v2/country-metrics/{country}/{year}",
+    "v3 country-metrics": "/v3/country-metrics/{country}/{year}",
+}
+
+COLD_START_SCRIPT = """
+import json, resource, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.warm_up()
+loaded = time.perf_counter()
+with open("/proc/self/statm") as f:
+    rss_pages = int(f.read().split()[1])
+print(json.dumps({
+    "import_s": imported - start,
+    "ready_s": loaded - start,
+    "rss_mb": rss_pages * resource.getpagesize() / 1e6,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6,
+}))
+"""
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    k = (len(sorted_values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def cold_start(runs: int) -> Dict[str, float]:
+    """Best-of-``runs`` import/readiness time and memory of main.py in a new process"""
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT],
+            capture_output=True, text=True, check=True, cwd=os.getcwd()
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key: min(result[key] for result in results) for key in results[0]}
+
+
+def country_years() -> List[tuple]:
+    from common.datastore import get_assessments_index
+    return sorted(get_assessments_index().keys())
+
+
+async def bench_endpoint(
+    client: httpx.AsyncClient,
+    template: str,
+    pairs: List[tuple],
+    rounds: int,
+    concurrency: int
+) -> Dict[str, float]:
+    urls = [template.format(country=country, year=year) for _ in range(rounds) for country, year in pairs]
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(url):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    # One warm-up pass so lazily built caches are not counted as latency
+    for url in urls[:len(pairs)]:
+        await client.get(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch(url) for url in urls))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(urls),
+        "errors": errors,
+        "throughput_rps": len(urls) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else float("nan"),
+    }
+
+
+async def bench_all(url: Optional[str], rounds: int, concurrency: int, endpoints: List[str]):
+    pairs = country_years()
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=60)
+    else:
+        import main
+        transport = httpx.ASGITransport(app=main.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+    async with client:
+        return {
+            name: await bench_endpoint(client, ENDPOINTS[name], pairs, rounds, concurrency)
+            for name in endpoints
+        }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(before: Dict, after: Dict) -> None:
+    rows = []
+    for name, stats in after["endpoints"].items():
+        old = before.get("endpoints", {}).get(name)
+        if not old:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p99_ms"):
+            change = (stats[metric] - old[metric]) / old[metric] * 100 if old[metric] else float("nan")
+            rows.append({"endpoint": name, "metric": metric, "before": f"{old[metric]:.2f}",
+                         "after": f"{stats[metric]:.2f}", "change": f"{change:+.1f}%"})
+    for metric in ("import_s", "ready_s", "rss_mb"):
+        old, new = before.get("cold_start", {}).get(metric), after.get("cold_start", {}).get(metric)
+        if old and new:
+            rows.append({"endpoint": "cold start", "metric": metric, "before": f"{old:.2f}",
+                         "after": f"{new:.2f}", "change": f"{(new - old) / old * 100:+.1f}%"})
+    print(f"\nCompared with {before.get('commit')}:")
+    print_table(rows, ["endpoint", "metric", "before", "after", "change"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over all (country, year) pairs")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--cold-start-runs", type=int, default=3, help="0 to skip")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    results = {
+        "benchmark": "endpoints",
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "mode": args.url or "asgi",
+        "rounds": args.rounds,
+        "concurrency": args.concurrency,
+    }
+    if args.cold_start_runs:
+        results["cold_start"] = cold_start(args.cold_start_runs)
+    results["endpoints"] = asyncio.run(bench_all(args.url, args.rounds, args.concurrency, args.endpoints))
+
+    rows = [
+        {"endpoint": name, **{key: f"{value:.2f}" if isinstance(value, float) else value
+                              for key, value in stats.items()}}
+        for name, stats in results["endpoints"].items()
+    ]
+    print_table(rows, ["endpoint", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    if "cold_start" in results:
+        print("\ncold start: " + ", ".join(f"{key}={value:.2f}" for key, value in results["cold_start"].items()))
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
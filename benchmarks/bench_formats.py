@@ -0,0 +1,97 @@
+"""
+Size and encode/decode cost of the /v3/country-metrics representations.
+
+For every (country, year) in the dataset, encodes the Pillar/Area/
+Indicator/Metric tree as each negotiable format (JSON, MessagePack, NDJSON,
+columnar JSON) and reports the total body size uncompressed, gzipped and
+brotli-compressed, with the time to encode on the server and to decode on
+a client. Run from the repository root:
+
+    python -m benchmarks.bench_formats [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import time
+import warnings
+from typing import Callable, Dict, List
+
+from common.compression import ENCODERS as COMPRESSORS
+from v3.formats import ENCODERS, available_formats
+from .harness import print_table
+
+
+def decoder(fmt: str) -> Callable[[bytes], object]:
+    if fmt == "msgpack":
+        import msgpack
+        return msgpack.unpackb
+    if fmt == "ndjson":
+        return lambda body: [json.loads(line) for line in body.splitlines()]
+    return json.loads
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench(repeat: int) -> List[Dict]:
+    import main
+    main.warm_up()
+    from v3.state import get_state
+    from v3.transformers import transform_country_data
+
+    state = get_state()
+    keys = sorted(state.melted_index.keys())
+    trees = {
+        key: transform_country_data(state.melted_index.get(*key), *key, state.sources.get(key))
+        for key in keys
+    }
+    documents = [json.loads(tree.model_dump_json()) for tree in trees.values()]
+
+    rows = []
+    for fmt in available_formats():
+        if fmt == "json":
+            encode = lambda: [tree.model_dump_json().encode() for tree in trees.values()]  # noqa: E731
+        else:
+            encode = lambda: [ENCODERS[fmt](document) for document in documents]  # noqa: E731
+
+        bodies = encode()
+        decode = decoder(fmt)
+        row = {
+            "format": fmt,
+            "responses": len(bodies),
+            "encode_ms": f"{best_time(encode, repeat) * 1000:.1f}",
+            "decode_ms": f"{best_time(lambda: [decode(body) for body in bodies], repeat) * 1000:.1f}",
+            "identity_kb": f"{sum(map(len, bodies)) / 1e3:.1f}",
+        }
+        for coding, compress in COMPRESSORS.items():
+            compressed = [compress(body) for body in bodies]
+            row[f"{coding}_kb"] = f"{sum(map(len, compressed)) / 1e3:.1f}"
+            row[f"{coding}_ms"] = f"{best_time(lambda: [compress(body) for body in bodies], 1) * 1000:.1f}"
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    rows = bench(args.repeat)
+    print_table(rows, list(rows[0]))
+    print("\nencode_ms: json serializes the prebuilt trees; the other formats start "
+          "from the parsed JSON document, as the server does.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
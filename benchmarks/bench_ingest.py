@@ -0,0 +1,158 @@
+"""
+Cold-load cost of each workbook: pd.read_excel against the streaming reader.
+
+For every workbook of the release, and for synthetic copies with ``scale``
+times the rows, times a cold parse (no binary cache) and traces its peak
+memory with:
+
+* ``read_excel``: ``pd.read_excel`` with the dates parsed afterwards, as
+  the datastore used to read them;
+* ``streaming``: :func:`common.ingest.read_sheet` on every column;
+* ``dataset``: the streaming reader with the projection, dates and
+  categoricals the shared Dataset uses;
+* ``no sources`` (assessments only): the projection v1 and v2 would need
+  on their own, without the ``source *`` columns.
+
+Every frame is checked against ``read_excel`` with the same columns and
+conversions. Run from the repository root:
+
+    python -m benchmarks.bench_ingest [--scales 1 10] [--repeat 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import tempfile
+import warnings
+from typing import Dict, List
+
+import pandas as pd
+
+from common.datastore import (
+    ASSESSMENTS_FILE, BENCHMARKS_FILE, COUNTRIES_FILE, DATE_COLUMNS, INDICATORS_FILE, SERIES_CATEGORIES,
+    TRENDS_FILE, UNUSED_COLUMNS
+)
+from common.ingest import Without, read_sheet
+from utils import get_data_path
+from .harness import measure, print_table
+
+# (workbook, date columns, categoricals) as the Dataset reads them
+WORKBOOKS = [
+    (ASSESSMENTS_FILE, DATE_COLUMNS, ()),
+    (TRENDS_FILE, DATE_COLUMNS, SERIES_CATEGORIES),
+    (BENCHMARKS_FILE, ("Publication date",), SERIES_CATEGORIES),
+    (COUNTRIES_FILE, (), ()),
+    (INDICATORS_FILE, (), ()),
+]
+NO_SOURCES = Without(names=UNUSED_COLUMNS.names, prefixes=("source ",))
+
+
+def read_excel(path: str, date_columns) -> pd.DataFrame:
+    df = pd.read_excel(path)
+    df.columns = df.columns.astype(str)
+    for col in date_columns:
+        df[col] = pd.to_datetime(df[col], dayfirst=True)
+    return df
+
+
+def enlarged_workbook(path: str, scale: int, out_dir: str) -> str:
+    """A copy of the workbook at ``path`` with ``scale`` times its rows, one country suffix per copy"""
+    import openpyxl
+
+    source = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    rows = list(source.worksheets[0].iter_rows(values_only=True))
+    source.close()
+    header, body = rows[0], rows[1:]
+    country = next((i for i, name in enumerate(header) if name in ("Country", "Name")), None)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for i in range(scale):
+        for row in body:
+            row = list(row)
+            if country is not None and row[country] is not None:
+                row[country] = f"{row[country]} #{i}"
+            sheet.append(row)
+    out = os.path.join(out_dir, f"x{scale}_{os.path.basename(path)}")
+    workbook.save(out)
+    return out
+
+
+def expected_frame(reference: pd.DataFrame, df: pd.DataFrame, categories) -> pd.DataFrame:
+    expected = reference[list(df.columns)].copy()
+    for col in categories:
+        if col in expected.columns:
+            expected[col] = expected[col].astype("category")
+    return expected
+
+
+def bench_workbook(path: str, filename: str, scale: int, date_columns, categories, repeat: int) -> List[Dict]:
+    readers = {
+        "streaming": lambda: read_sheet(path, None, date_columns),
+        "dataset": lambda: read_sheet(path, UNUSED_COLUMNS, date_columns, categories),
+    }
+    if filename == ASSESSMENTS_FILE:
+        readers["no sources"] = lambda: read_sheet(path, NO_SOURCES, date_columns)
+
+    reference, stats = measure(lambda: read_excel(path, date_columns), repeat)
+    rows = [{
+        "workbook": filename,
+        "scale": scale,
+        "reader": "read_excel",
+        "rows": len(reference),
+        "columns": len(reference.columns),
+        "best_s": f"{stats['best_s']:.3f}",
+        "speedup": "1.0x",
+        "peak_mb": f"{stats['peak_mb']:.1f}",
+        "same": "-",
+    }]
+    baseline = stats["best_s"]
+    for name, read in readers.items():
+        df, stats = measure(read, repeat)
+        try:
+            pd.testing.assert_frame_equal(df, expected_frame(reference, df, categories if name == "dataset" else ()))
+            same = "yes"
+        except AssertionError:
+            same = "NO"
+        rows.append({
+            "workbook": filename,
+            "scale": scale,
+            "reader": name,
+            "rows": len(df),
+            "columns": len(df.columns),
+            "best_s": f"{stats['best_s']:.3f}",
+            "speedup": f"{baseline / stats['best_s']:.1f}x",
+            "peak_mb": f"{stats['peak_mb']:.1f}",
+            "same": same,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-path", help="release directory (defaults to the one the API would serve)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    data_path = args.data_path or get_data_path()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for scale in args.scales:
+            for filename, date_columns, categories in WORKBOOKS:
+                path = os.path.join(data_path, filename)
+                if scale > 1:
+                    path = enlarged_workbook(path, scale, out_dir)
+                rows.extend(bench_workbook(path, filename, scale, date_columns, categories, args.repeat))
+    print_table(rows, list(rows[0]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Serialization cost per endpoint, with Starlette's JSONResponse and with
+common.responses.FastJSONResponse.
+
+For each endpoint the content its handler gives FastAPI is encoded every
+way it would be before and after:
+
+* endpoints returning dicts of pandas values (v1/v2 country-data) go
+  through ``jsonable_encoder`` and then ``json.dumps`` before, and straight
+  to orjson after;
+* endpoints with a response model are serialized by Pydantic either way,
+  so only the final render changes.
+
+The "raw row" endpoint is a whole assessment row (dates, NaN, NumPy
+numbers), which the old path cannot encode. Bodies are checked to decode
+to the same document. Run from the repository root:
+
+    python -m benchmarks.bench_json [--repeat 5] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import time
+import warnings
+from typing import Any, Callable, Dict, List
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from common.responses import FastJSONResponse
+from .bench_endpoints import country_years
+from .harness import print_table
+
+MODEL_ENDPOINTS = {
+    "v3 countries": ["/v3/countries"],
+    "v3 indicators": ["/v3/indicators"],
+    "v3 trends": ["/v3/trends/{country}"],
+    "v3 benchmarks": ["/v3/benchmarks/{country}"],
+    "v3 query": ["/v3/query?types=indicator&values=Yes&group_by=pillar&group_by=value"],
+    "v3 diff": ["/v3/country-metrics/{country}/diff?from={first}&to={last}"],
+}
+
+
+def before_raw(content: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def before_model(content: Any) -> bytes:
+    return JSONResponse(content).body
+
+
+def after(content: Any) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def raw_payloads(dataset, pairs, prefixes) -> List[Dict]:
+    payloads = []
+    for country, year in pairs:
+        data = dataset.assessments_index.get(country, year)
+        payload = {"country": country, "assessment_year": year}
+        for col in data.columns:
+            if col.startswith(prefixes):
+                payload[col.replace("area ", "").replace(".", "_")] = data[col].iloc[0]
+        payloads.append(payload)
+    return payloads
+
+
+async def model_payloads(paths: List[str], pairs) -> List[Any]:
+    import main
+    by_country: Dict[str, List[int]] = {}
+    for country, year in pairs:
+        by_country.setdefault(country, []).append(year)
+
+    urls = []
+    for path in paths:
+        if "{country}" not in path:
+            urls.append(path)
+            continue
+        for country, years in sorted(by_country.items()):
+            urls.append(path.format(country=country, first=min(years), last=max(years)))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        responses = [await client.get(url) for url in urls]
+    return [response.json() for response in responses if response.status_code == 200]
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def encode_all(encode: Callable[[Any], bytes], payloads: List[Any]):
+    try:
+        return [encode(payload) for payload in payloads]
+    except (TypeError, ValueError):
+        return None
+
+
+def bench(repeat: int) -> List[Dict]:
+    import main
+    main.warm_up()
+    from common.datastore import get_dataset
+    dataset = get_dataset()
+    pairs = country_years()
+
+    endpoints = {
+        "v1/v2 country-data": (before_raw, raw_payloads(dataset, pairs, ("area",))),
+        "raw row": (before_raw, raw_payloads(dataset, pairs, ("area", "indicator", "metric", "year", "source"))),
+    }
+    for name, paths in MODEL_ENDPOINTS.items():
+        payloads = asyncio.run(model_payloads(paths, pairs))
+        if payloads:
+            endpoints[name] = (before_model, payloads)
+
+    rows = []
+    for name, (before, payloads) in endpoints.items():
+        old = encode_all(before, payloads)
+        new = encode_all(after, payloads)
+        if old is not None:
+            assert [json.loads(body) for body in old] == [json.loads(body) for body in new], f"{name} differs"
+        old_us = best_time(lambda: encode_all(before, payloads), repeat) / len(payloads) * 1e6
+        new_us = best_time(lambda: encode_all(after, payloads), repeat) / len(payloads) * 1e6
+        rows.append({
+            "endpoint": name,
+            "responses": len(payloads),
+            "kb_each": f"{sum(map(len, new)) / len(new) / 1e3:.1f}",
+            "before_us": f"{old_us:.0f}" if old is not None else "error",
+            "after_us": f"{new_us:.0f}",
+            "speedup": f"{old_us / new_us:.1f}x" if old is not None else "-",
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    rows = bench(args.repeat)
+    print_table(rows, list(rows[0]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "json", "time": time.time(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Memory footprint and comparison cost of the melted v3 table.
+
+Compares three representations of the same long table:
+
+* ``legacy``: the original melt, with every ``source *`` column merged
+  onto every row (benchmarks/legacy_v3_transformers.py);
+* ``object``: the current melt with its categoricals decoded back to
+  ``object`` columns of strings;
+* ``categorical``: the current melt as it is served.
+
+Memory is the deep ``memory_usage`` of the frame. The filters are the
+operations requests run against the table: a pillar/country/value
+comparison and a (country, year) groupby. Run from the repository root:
+
+    python -m benchmarks.bench_melted_memory [--scales 1 10] [--json out.json]
+"""
+import argparse
+import json
+import time
+import warnings
+
+import pandas as pd
+
+from common.datastore import get_assessments
+from v3 import transformers
+from . import legacy_v3_transformers as legacy
+from .harness import enlarge, print_table
+
+OPERATIONS = {
+    "pillar == EP": lambda df: df['pillar'] == 'EP',
+    "country == X": lambda df: df['Country'] == df['Country'].iloc[-1],
+    "value in (Yes, Partial)": lambda df: df['value'].isin(['Yes', 'Partial']),
+    "groupby country, year": lambda df: df.groupby(
+        [df['Country'], df['Assessment date'].dt.year], observed=True, sort=False
+    ).size(),
+}
+
+
+def decoded(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype({
+        col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)
+    })
+
+
+def best_time(fn, df, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_scale(df: pd.DataFrame, scale: int, repeat: int):
+    data = enlarge(df, scale)
+    label = f"{scale}x ({data['Country'].nunique()} countries)"
+
+    melted = transformers.melt_assessment_data(data.copy())
+    frames = {
+        "legacy": legacy.melt_assessment_data(data.copy()),
+        "object": decoded(melted),
+        "categorical": melted,
+    }
+
+    rows = []
+    for impl, frame in frames.items():
+        row = {
+            "dataset": label,
+            "impl": impl,
+            "rows": len(frame),
+            "frame_mb": f"{frame.memory_usage(deep=True).sum() / 1e6:.1f}",
+        }
+        for name, operation in OPERATIONS.items():
+            row[name + " ms"] = f"{best_time(operation, frame, repeat) * 1000:.2f}"
+        rows.append(row)
+    return rows
+
+
+def column_breakdown(df: pd.DataFrame):
+    melted = transformers.melt_assessment_data(df.copy())
+    before = decoded(melted).memory_usage(deep=True, index=False)
+    after = melted.memory_usage(deep=True, index=False)
+    return [
+        {
+            "column": col,
+            "dtype": str(melted[col].dtype),
+            "object_kb": f"{before[col] / 1e3:.1f}",
+            "categorical_kb": f"{after[col] / 1e3:.1f}",
+            "ratio": f"{before[col] / max(after[col], 1):.1f}x",
+        }
+        for col in melted.columns
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    df = get_assessments()
+
+    breakdown = column_breakdown(df)
+    print("Per-column memory on the bundled dataset")
+    print_table(breakdown, list(breakdown[0]))
+
+    rows = []
+    for scale in args.scales:
+        rows.extend(bench_scale(df, scale, args.repeat))
+    print()
+    print_table(rows, list(rows[0]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"columns": breakdown, "scales": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Start-up time, memory and /country-metrics latency of a worker serving the
+workbooks versus one serving a prebuilt snapshot (common/snapshot.py).
+
+Builds a snapshot of the current release into a temporary directory, then
+for each mode starts a fresh interpreter that imports ``main`` and starts
+the app with its lifespan, as uvicorn would, waits for /ready, requests
+every v2 and v3 /country-metrics (country, year) in process and reports
+the time to ready, resident memory, whether pandas was imported once the
+requests were served and the request latency. Run from the repository root:
+
+    python -m benchmarks.bench_snapshot [--runs 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+from typing import Dict, Optional
+
+from common.snapshot import build_snapshot
+from .harness import print_table
+
+WORKER_SCRIPT = """
+import json, resource, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import main
+from fastapi.testclient import TestClient
+pairs = json.loads(sys.argv[1])
+
+# The client runs the app's lifespan (warm-up, data watcher), so what is
+# imported is what a uvicorn worker would import
+with TestClient(main.app) as client:
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter() - start
+    with open("/proc/self/statm") as f:
+        rss_pages = int(f.read().split()[1])
+    rss_mb = rss_pages * resource.getpagesize() / 1e6
+
+    latencies = []
+    for version in ("v2", "v3"):
+        for country, year in pairs:
+            t = time.perf_counter()
+            response = client.get(f"/{version}/country-metrics/{country}/{year}")
+            latencies.append(time.perf_counter() - t)
+            assert response.status_code == 200, response.text
+    latencies.sort()
+    pandas = "pandas" in sys.modules
+
+print(json.dumps({
+    "ready_s": ready,
+    "rss_mb": rss_mb,
+    "pandas": pandas,
+    "p50_ms": latencies[len(latencies) // 2] * 1000,
+}))
+"""
+
+
+def run_worker(pairs, snapshot: Optional[str], runs: int) -> Dict:
+    env = {k: v for k, v in os.environ.items() if k != "ASCOR_SNAPSHOT"}
+    if snapshot:
+        env["ASCOR_SNAPSHOT"] = snapshot
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", WORKER_SCRIPT, json.dumps(pairs)],
+            capture_output=True, text=True, check=True, cwd=os.getcwd(), env=env
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key: min(result[key] for result in results) for key in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per mode; the best is reported")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    with tempfile.TemporaryDirectory() as tmp:
+        build = build_snapshot(os.path.join(tmp, "ascor.sqlite"))
+        from common.datastore import get_assessments_index
+        pairs = sorted(get_assessments_index().keys())
+
+        results = {
+            "workbooks": run_worker(pairs, None, args.runs),
+            "snapshot": run_worker(pairs, build["snapshot"], args.runs),
+        }
+
+    print(f"Snapshot: {build['responses']} responses, {build['size_mb']} MB, built in {build['build_seconds']}s\n")
+    rows = [
+        {
+            "mode": mode,
+            "ready_s": f"{stats['ready_s']:.2f}",
+            "rss_mb": f"{stats['rss_mb']:.0f}",
+            "pandas": stats["pandas"],
+            "p50_ms": f"{stats['p50_ms']:.2f}",
+        }
+        for mode, stats in results.items()
+    ]
+    print_table(rows, list(rows[0]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"build": build, "modes": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
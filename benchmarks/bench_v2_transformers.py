@@ -0,0 +1,104 @@
+"""
+Per-request cost of the v2 /country-metrics lookup and tree transform.
+
+Compares, for every (country, year) of the bundled dataset:
+
+* ``legacy``: the original handler, copying the row's area/indicator/metric
+  cells out of the indexed slice into a dict and scanning its keys per
+  pillar and area (benchmarks/legacy_v2_transformers.py);
+* ``header plan``: ``v2.transformers.transform_country_data`` on the same
+  dict, with a plan compiled from its keys;
+* ``precompiled``: what the API runs, the release's compiled plan filled
+  from the prebuilt row.
+
+All three must produce identical trees. Also checks that a release adding
+an area and indicator is picked up by the plan. Run from the repository root:
+
+    python -m benchmarks.bench_v2_transformers [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import time
+import warnings
+from typing import Dict, List
+
+from common.datastore import Dataset, get_dataset
+from v2 import transformers
+from v2.state import V2State
+from . import legacy_v2_transformers as legacy
+from .harness import measure, print_table
+
+
+def raw_data(dataset: Dataset, country: str, year: int) -> Dict:
+    data = dataset.assessments_index.get(country, year)
+    raw = {"country": country, "assessment_year": year}
+    for col in data.columns:
+        if col.startswith(("area", "indicator", "metric")):
+            raw[col] = data[col].iloc[0]
+    return raw
+
+
+def bench(repeat: int) -> List[Dict]:
+    dataset = get_dataset()
+    state = V2State(dataset)
+    keys = sorted(dataset.assessments_index.keys())
+
+    impls = {
+        "legacy": lambda: [legacy.transform_country_data(raw_data(dataset, *key)) for key in keys],
+        "header plan": lambda: [transformers.transform_country_data(raw_data(dataset, *key)) for key in keys],
+        "precompiled": lambda: [state.plan.build(state.row(*key), *key) for key in keys],
+    }
+    # The transform alone, from the inputs each implementation is given
+    raws = [raw_data(dataset, *key) for key in keys]
+    transforms = {
+        "legacy": lambda: [legacy.transform_country_data(raw) for raw in raws],
+        "header plan": lambda: [transformers.transform_country_data(raw) for raw in raws],
+        "precompiled": lambda: [state.plan.build(state.row(*key), *key) for key in keys],
+    }
+
+    expected = impls["legacy"]()
+    rows = []
+    for impl in impls:
+        trees, total = measure(impls[impl], repeat)
+        assert trees == expected, f"{impl} output differs"
+        _, transform = measure(transforms[impl], repeat)
+        rows.append({
+            "impl": impl,
+            "requests": len(keys),
+            "lookup+transform_us": f"{total['best_s'] / len(keys) * 1e6:.0f}",
+            "transform_us": f"{transform['best_s'] / len(keys) * 1e6:.0f}",
+            "speedup": f"{float(rows[0]['lookup+transform_us']) / (total['best_s'] / len(keys) * 1e6):.1f}x"
+            if rows else "1.0x",
+        })
+    return rows
+
+
+def check_new_release() -> int:
+    """A release with one more area and indicator yields them with no code change"""
+    dataset = get_dataset()
+    headers = [*dataset.assessments.columns, "area CP.7", "indicator CP.7.a", "metric CP.7.a.i"]
+    plan = transformers.TransformPlan.compile(headers, zip(dataset.indicators['Type'], dataset.indicators['Code']))
+    area = next(area for pillar in plan.pillars for area in pillar.areas if area.name == "CP.7")
+    assert [node.name for node in area.indicators] == ["CP.7.a"]
+    assert area.indicators[0].metric == "CP.7.a.i"
+    return sum(len(area.indicators) for pillar in plan.pillars for area in pillar.areas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    rows = bench(args.repeat)
+    print_table(rows, list(rows[0]))
+    print(f"\nA release adding CP.7 compiles to a plan of {check_new_release()} indicators.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "v2_transformers", "time": time.time(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Before/after benchmark of the v3 melt and tree builder.
+
+Compares the original implementation (benchmarks/legacy_v3_transformers.py)
+with v3/transformers.py on the bundled dataset and on a synthetic copy with
+more countries. Run from the repository root:
+
+    python -m benchmarks.bench_v3_transformers [--scales 1 100] [--json out.json]
+
+The legacy tree builder costs tens of milliseconds per country-year, so on
+enlarged datasets it is timed on a sample of trees and its full cost is
+projected from the per-tree mean (marked with ``*``).
+"""
+import argparse
+import json
+import time
+import warnings
+
+from common.datastore import get_assessments
+from common.index import CountryYearIndex
+from v3 import transformers
+from . import legacy_v3_transformers as legacy
+from .harness import enlarge, measure, print_table
+
+
+def bench_scale(df, scale: int, repeat: int, legacy_sample: int):
+    rows = []
+    data = enlarge(df, scale)
+    label = f"{scale}x ({data['Country'].nunique()} countries)"
+
+    old_melted, old_melt = measure(lambda: legacy.melt_assessment_data(data.copy()), repeat)
+    new_melted, new_melt = measure(
+        lambda: (transformers.melt_assessment_data(data.copy()), transformers.extract_sources(data)),
+        repeat
+    )
+    new_melted, sources = new_melted
+
+    rows.append(dict(dataset=label, stage="melt", impl="legacy", **_fmt(old_melt),
+                     frame_mb=f"{old_melted.memory_usage(deep=True).sum() / 1e6:.1f}"))
+    rows.append(dict(dataset=label, stage="melt", impl="vectorized", **_fmt(new_melt),
+                     frame_mb=f"{new_melted.memory_usage(deep=True).sum() / 1e6:.1f}"))
+
+    index = CountryYearIndex(old_melted)
+    keys = list(index.keys())
+    sample = keys if scale == 1 else keys[:legacy_sample]
+
+    def legacy_trees():
+        return [legacy.transform_country_data(index.get(*key), *key) for key in sample]
+
+    old_trees, old_tree = measure(legacy_trees, 1 if len(sample) < len(keys) else repeat)
+    projected = len(sample) < len(keys)
+    if projected:
+        for stat in ("best_s", "mean_s"):
+            old_tree[stat] *= len(keys) / len(sample)
+
+    new_trees, new_tree = measure(lambda: transformers.transform_all_countries(new_melted, sources), repeat)
+
+    for key, tree in zip(sample, old_trees):
+        assert tree == new_trees[key], f"Output differs for {key}"
+
+    rows.append(dict(dataset=label, stage="trees", impl="legacy" + ("*" if projected else ""),
+                     **_fmt(old_tree), frame_mb="-"))
+    rows.append(dict(dataset=label, stage="trees", impl="vectorized", **_fmt(new_tree), frame_mb="-"))
+    return rows
+
+
+def _fmt(stats):
+    return {
+        "best_ms": f"{stats['best_s'] * 1000:.1f}",
+        "mean_ms": f"{stats['mean_s'] * 1000:.1f}",
+        "peak_mb": f"{stats['peak_mb']:.1f}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-sample", type=int, default=200,
+                        help="trees timed with the legacy builder on enlarged datasets")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    df = get_assessments()
+
+    rows = []
+    for scale in args.scales:
+        rows.extend(bench_scale(df, scale, args.repeat, args.legacy_sample))
+
+    print_table(rows, ["dataset", "stage", "impl", "best_ms", "mean_ms", "peak_mb", "frame_mb"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "v3_transformers", "time": time.time(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
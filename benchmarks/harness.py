@@ -0,0 +1,55 @@
+"""Small helpers shared by the benchmark scripts."""
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+import pandas as pd
+
+
+def measure(fn: Callable[[], Any], repeat: int = 3) -> Tuple[Any, Dict[str, float]]:
+    """
+    Run ``fn`` ``repeat`` times and return its last result with timings.
+
+    Peak memory is traced on one extra run so that tracemalloc's overhead
+    does not distort the timings.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    result = None
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, {
+        "best_s": min(timings),
+        "mean_s": sum(timings) / len(timings),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def enlarge(df: pd.DataFrame, factor: int) -> pd.DataFrame:
+    """Synthetic copy of the assessments with ``factor`` times the countries"""
+    if factor == 1:
+        return df.copy()
+    copies = []
+    for i in range(factor):
+        copy = df.copy()
+        copy["Country"] = copy["Country"] + f" #{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def print_table(rows, columns) -> None:
+    widths = [max(len(str(col)), *(len(str(row[col])) for row in rows)) for col in columns]
+    print("  ".join(str(col).ljust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[col]).ljust(width) for col, width in zip(columns, widths)))
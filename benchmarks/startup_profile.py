@@ -0,0 +1,128 @@
+"""
+Where the cold-start time goes.
+
+Starts main.py in a fresh interpreter under ``python -X importtime``, runs
+the same warm-up the server runs in the background, and reports:
+
+* the phases of start-up: importing main, importing each versioned app,
+  and each stage of loading the dataset (workbooks and per-version state);
+* the slowest imports, grouped by top-level package, and the slowest
+  individual modules.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_profile
+    python -m benchmarks.startup_profile --top 25 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+from .harness import print_table
+
+STARTUP_SCRIPT = """
+import json, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.warm_up()
+from common.datastore import get_dataset
+dataset = get_dataset()
+print(json.dumps({
+    "import main": imported - start,
+    **{"import " + prefix.strip("/"): app.load_seconds for prefix, app in main.SUB_APPS.items()},
+    **{"load " + stage: seconds for stage, seconds in dataset.timings.items()},
+    "total": time.perf_counter() - start,
+}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """One entry per imported module: name, nesting depth, self and cumulative microseconds"""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "depth": len(indent) // 2,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            })
+    return modules
+
+
+def by_package(modules: List[Dict]) -> Dict[str, int]:
+    """Self import time (microseconds) summed per top-level package"""
+    totals: Dict[str, int] = {}
+    for module in modules:
+        package = module["module"].split(".")[0]
+        totals[package] = totals.get(package, 0) + module["self_us"]
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def profile() -> Dict:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        capture_output=True, text=True, check=True, cwd=os.getcwd()
+    )
+    return {
+        "phases": json.loads(out.stdout.strip().splitlines()[-1]),
+        "modules": parse_importtime(out.stderr),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and start-up phase profile of main.py")
+    parser.add_argument("--top", type=int, default=15, help="packages and modules to list")
+    parser.add_argument("--json", help="write the full profile to this file")
+    args = parser.parse_args()
+
+    result = profile()
+    phases = result["phases"]
+    print("Start-up phases")
+    print_table(
+        [{"phase": phase, "ms": f"{seconds * 1000:.1f}"} for phase, seconds in phases.items()],
+        ["phase", "ms"]
+    )
+
+    modules = result["modules"]
+    total_us = sum(module["self_us"] for module in modules)
+    print(f"\nImports by package ({len(modules)} modules, {total_us / 1000:.1f} ms)")
+    print_table(
+        [
+            {"package": package, "self_ms": f"{us / 1000:.1f}", "share": f"{100 * us / total_us:.1f}%"}
+            for package, us in list(by_package(modules).items())[:args.top]
+        ],
+        ["package", "self_ms", "share"]
+    )
+
+    print("\nSlowest modules (cumulative, including their own imports)")
+    slowest = sorted(modules, key=lambda module: -module["cumulative_us"])[:args.top]
+    print_table(
+        [
+            {
+                "module": module["module"],
+                "self_ms": f"{module['self_us'] / 1000:.1f}",
+                "cumulative_ms": f"{module['cumulative_us'] / 1000:.1f}",
+            }
+            for module in slowest
+        ],
+        ["module", "self_ms", "cumulative_ms"]
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Response body compression.
+
+gzip is always available; brotli is used when the optional ``brotli``
+package is installed. Compressed bodies of cached responses are kept on
+the cache entry (see :mod:`common.response_cache`), so each variant is
+compressed once per release rather than once per request.
+"""
+import gzip
+from typing import Callable, Dict, Optional
+
+# Bodies smaller than this are sent as they are; compressing them saves
+# less than the header costs
+MIN_SIZE = 512
+
+GZIP_LEVEL = 6
+# Cached bodies are compressed once and sent many times, so spend more
+# effort than a per-request compressor would
+BROTLI_QUALITY = 9
+
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the output, and so the ETag of the variant, stable
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders = {}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        encoders["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    encoders["gzip"] = _gzip
+    return encoders
+
+
+# In order of preference
+ENCODERS = _encoders()
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+    """The best content coding for a body of ``size`` bytes, or None to send it as is"""
+    if not accept_encoding or size < MIN_SIZE:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in ENCODERS:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return ENCODERS[encoding](body)
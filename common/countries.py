@@ -0,0 +1,122 @@
+"""
+Country name resolution and autocomplete.
+
+Clients name countries in many ways: "United Kingdom", "united kingdom",
+"GBR", "UK", "Turkiye" for "Türkiye". :class:`CountryResolver` maps all
+of them to the canonical name the frames are keyed on with one dict
+lookup, and serves prefix suggestions from a trie whose nodes hold their
+ranked answers. It only needs (name, ISO code) pairs, so it is built from
+the countries workbook when a release loads and from a snapshot's
+country table when serving one.
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+
+# Suggestions rank matches on the start of the name first, then on the
+# ISO code, then on a later word ("korea" for "Republic of Korea")
+NAME, CODE, WORD = 0, 1, 2
+
+
+def normalize(text: str) -> str:
+    """Case-folded, accent-stripped, with punctuation and spacing collapsed"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _SEPARATORS.sub(" ", stripped.casefold()).strip()
+
+
+def _initialism(normalized_name: str) -> Optional[str]:
+    words = normalized_name.split()
+    return "".join(word[0] for word in words) if len(words) > 1 else None
+
+
+class _TrieNode:
+    __slots__ = ("children", "ranks", "names")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.ranks: Dict[str, int] = {}
+        self.names: Tuple[str, ...] = ()
+
+
+class CountryResolver:
+    """
+    Maps names, ISO codes and initialisms of countries to canonical names.
+
+    Keys are compared after :func:`normalize`. Names and ISO codes always
+    win; an initialism ("uk", "uae") is only added when no other country
+    or code claims it.
+    """
+
+    def __init__(self, countries: Iterable[Tuple[str, Optional[str]]]):
+        self.iso_codes: Dict[str, Optional[str]] = {}
+        for name, iso_code in countries:
+            # Missing codes may come in as NaN
+            iso_code = iso_code if isinstance(iso_code, str) and iso_code else None
+            if name and (iso_code or name not in self.iso_codes):
+                self.iso_codes[name] = iso_code
+
+        self._keys: Dict[str, str] = {}
+        for name in self.iso_codes:
+            self._keys.setdefault(normalize(name), name)
+        for name, iso_code in self.iso_codes.items():
+            if iso_code:
+                self._keys.setdefault(normalize(iso_code), name)
+
+        initialisms: Dict[str, List[str]] = {}
+        for name in self.iso_codes:
+            key = _initialism(normalize(name))
+            if key:
+                initialisms.setdefault(key, []).append(name)
+        for key, names in initialisms.items():
+            if len(names) == 1 and key not in self._keys:
+                self._keys[key] = names[0]
+
+        self._root = _TrieNode()
+        for name, iso_code in self.iso_codes.items():
+            words = normalize(name).split()
+            self._insert(" ".join(words), name, NAME)
+            for i in range(1, len(words)):
+                self._insert(" ".join(words[i:]), name, WORD)
+            if iso_code:
+                self._insert(normalize(iso_code), name, CODE)
+        self._finalize(self._root)
+
+    def _insert(self, key: str, name: str, rank: int) -> None:
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.ranks[name] = min(rank, node.ranks.get(name, rank))
+
+    def _finalize(self, root: _TrieNode) -> None:
+        # Every node keeps its answer, best first, so a suggestion costs
+        # one step per character of the prefix
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.names = tuple(sorted(node.ranks, key=lambda name: (node.ranks[name], name)))
+            node.ranks = {}
+            stack.extend(node.children.values())
+
+    def resolve(self, country: str) -> Optional[str]:
+        """The canonical name for ``country``, or None if it is unknown"""
+        if country in self.iso_codes:
+            return country
+        return self._keys.get(normalize(country))
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Canonical names matching ``prefix``, best first"""
+        node = self._root
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return list(node.names[:limit])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.iso_codes
+
+    def __len__(self) -> int:
+        return len(self.iso_codes)
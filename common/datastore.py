@@ -0,0 +1,397 @@
+"""Shared, load-once access to the ASCOR workbooks.
+
+Every versioned app gets its data from here instead of calling
+``pd.read_excel`` itself. The first load of a workbook streams it with
+openpyxl (see :mod:`common.ingest`), keeping only the columns some
+version reads, and writes a columnar binary cache next to the ``.xlsx``
+file, keyed on a hash of the workbook contents and of how it was read.
+Later loads (other uvicorn workers, restarts) read that cache and never
+touch openpyxl.
+
+The loaded data lives in an immutable :class:`Dataset`. A new data release
+is picked up by building a complete new ``Dataset`` (including the
+per-version state registered with :func:`register_builder`) and then
+swapping a single reference, so requests never see a half-built state.
+"""
+import glob
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from utils import get_data_path
+from .countries import CountryResolver
+from .index import CountryYearIndex, KeyIndex
+from .ingest import IngestStats, Projection, Without, ingest
+from .metrics import (
+    DATASET_LOAD_SECONDS, DATASET_LOADED, DATASET_LOADS, WORKBOOK_INGEST_PEAK_BYTES, WORKBOOK_INGEST_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+ASSESSMENTS_FILE = "ASCOR_assessments_results.xlsx"
+TRENDS_FILE = "ASCOR_assessments_results_trends_pathways.xlsx"
+BENCHMARKS_FILE = "ASCOR_benchmarks.xlsx"
+COUNTRIES_FILE = "ASCOR_countries.xlsx"
+INDICATORS_FILE = "ASCOR_indicators.xlsx"
+# Every workbook a Dataset loads
+WORKBOOKS = (ASSESSMENTS_FILE, COUNTRIES_FILE, TRENDS_FILE, BENCHMARKS_FILE, INDICATORS_FILE)
+# Written day first in the workbooks (01/12/2023 is 1 December 2023)
+DATE_COLUMNS = ("Assessment date", "Publication date")
+# Bookkeeping columns of the workbooks that no API version reads
+UNUSED_COLUMNS = Without(names=("Id", "Country Id", "Notes"))
+# Text columns of the emissions series that repeat a few values on every row
+SERIES_CATEGORIES = ("Country", "Emissions metric", "Emissions boundary", "Units", "Benchmark type")
+
+# Feather (Arrow IPC) is memory-mappable and by far the fastest to read back.
+# Pickle is kept as a fallback for environments without pyarrow, or for
+# frames whose object columns Arrow cannot represent.
+CACHE_FORMATS = ("feather", "pkl")
+# Names of the caches next to a workbook: <workbook>.<content digest>,
+# then a read key (absent from caches written before there were any),
+# then the format. Only files named like this are ever pruned
+_CACHE_NAME = r"\.[0-9a-f]{16}(?:\.[0-9a-f]{8})?\.(?:%s)" % "|".join(CACHE_FORMATS)
+
+_builders: Dict[str, Callable[["Dataset"], Any]] = {}
+_current: Optional["Dataset"] = None
+_reload_lock = threading.Lock()
+_reload_thread: Optional[threading.Thread] = None
+
+
+def _file_digest(path: str) -> str:
+    """Short content hash of a workbook, used as the cache key"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def _cache_stem(path: str) -> str:
+    return f"{path}.{_file_digest(path)}"
+
+
+def _read_key(usecols: Projection, date_columns: Iterable[str], categories: Iterable[str]) -> str:
+    """
+    Short hash of how a workbook is read, so a frame read another way
+    (other columns, dates or categoricals) is never served from the cache
+    """
+    if usecols is None or isinstance(usecols, Without):
+        projection = repr(usecols)
+    elif callable(usecols):
+        projection = f"{usecols.__module__}.{usecols.__qualname__}"
+    else:
+        projection = repr(sorted(usecols))
+    key = repr((projection, tuple(date_columns), tuple(categories)))
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+
+def _read_cache(stem: str):
+    for fmt in CACHE_FORMATS:
+        cache_file = f"{stem}.{fmt}"
+        if not os.path.exists(cache_file):
+            continue
+        try:
+            if fmt == "feather":
+                return pd.read_feather(cache_file)
+            return pd.read_pickle(cache_file)
+        except Exception as e:
+            logger.warning("Ignoring unreadable cache %s: %s", cache_file, e)
+    return None
+
+
+def _write_cache(df: pd.DataFrame, path: str, cache_stem: str) -> None:
+    """
+    Write the cache atomically and remove every other cache of the
+    workbook: those of older contents and those read another way
+    """
+    for fmt in CACHE_FORMATS:
+        cache_file = f"{cache_stem}.{fmt}"
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            if fmt == "feather":
+                df.to_feather(tmp_file)
+            else:
+                df.to_pickle(tmp_file)
+            os.replace(tmp_file, cache_file)
+            break
+        except Exception as e:
+            logger.warning("Could not write %s cache for %s: %s", fmt, path, e)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+    else:
+        return
+
+    cache_name = re.compile(re.escape(os.path.basename(path)) + _CACHE_NAME)
+    for stale in glob.glob(glob.escape(path) + ".*"):
+        if stale != cache_file and cache_name.fullmatch(os.path.basename(stale)):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_workbook(
+    filename: str,
+    date_columns: Iterable[str] = (),
+    data_path: Optional[str] = None,
+    usecols: Projection = None,
+    categories: Iterable[str] = ()
+) -> Tuple[pd.DataFrame, IngestStats]:
+    """
+    Read a workbook from the data directory, going through the binary
+    cache, and report what the read cost.
+
+    Only the ``usecols`` columns are read (all of them by default). Column
+    names are always strings (some headers in the ASCOR release are bare
+    numbers); ``date_columns`` are parsed to datetimes and ``categories``
+    to categoricals as the workbook is read, before caching.
+    """
+    path = os.path.join(data_path or get_data_path(), filename)
+    date_columns, categories = tuple(date_columns), tuple(categories)
+    cache_stem = f"{_cache_stem(path)}.{_read_key(usecols, date_columns, categories)}"
+
+    start = time.perf_counter()
+    df = _read_cache(cache_stem)
+    if df is not None:
+        return df, IngestStats(
+            workbook=filename,
+            source="cache",
+            rows=len(df),
+            columns=len(df.columns),
+            seconds=time.perf_counter() - start,
+        )
+
+    df, stats = ingest(path, usecols, date_columns, categories)
+    _write_cache(df, path, cache_stem)
+    return df, stats
+
+
+def data_fingerprint(data_path: Optional[str] = None) -> Tuple[str, Tuple[int, ...]]:
+    """
+    Identifies a data release: its directory and the mtimes of all the
+    workbooks a :class:`Dataset` loads, so replacing any one of them is a
+    new release
+    """
+    data_path = data_path or get_data_path()
+    return data_path, tuple(os.stat(os.path.join(data_path, filename)).st_mtime_ns for filename in WORKBOOKS)
+
+
+class Dataset:
+    """
+    One fully loaded data release.
+
+    Never mutated after it is published; a reload builds a new instance.
+    ``derived`` holds the state each API version builds from the release
+    (melted tables, indexes, response caches).
+    """
+
+    def __init__(self, data_path: Optional[str] = None):
+        self.data_path = data_path or get_data_path()
+        self.fingerprint = data_fingerprint(self.data_path)
+        self.release = os.path.basename(self.data_path)
+
+        self.timings: Dict[str, float] = {}
+        self.ingest: Dict[str, IngestStats] = {}
+        start = time.perf_counter()
+
+        with self._stage("assessments"):
+            self.assessments = self._read(ASSESSMENTS_FILE, DATE_COLUMNS)
+            self.assessments_index = CountryYearIndex(self.assessments)
+
+        # The other workbooks, indexed on their join keys: country name
+        # (countries' "Name", "Country" elsewhere) and indicator code
+        with self._stage("countries"):
+            self.countries = self._read(COUNTRIES_FILE)
+            self.countries_index = KeyIndex(self.countries, "Name")
+            # Names and ISO codes of the countries workbook, plus any
+            # assessed country missing from it
+            self.country_resolver = CountryResolver([
+                *zip(self.countries["Name"], self.countries["Country ISO code"]),
+                *((name, None) for name in self.assessments_index.countries),
+            ])
+        with self._stage("trends"):
+            self.trends = self._read(TRENDS_FILE, DATE_COLUMNS, SERIES_CATEGORIES)
+            self.trends_index = KeyIndex(self.trends, "Country")
+        with self._stage("benchmarks"):
+            self.benchmarks = self._read(BENCHMARKS_FILE, ("Publication date",), SERIES_CATEGORIES)
+            self.benchmarks_index = KeyIndex(self.benchmarks, "Country")
+        with self._stage("indicators"):
+            self.indicators = self._read(INDICATORS_FILE)
+            self.indicators_index = KeyIndex(self.indicators, "Code")
+
+        self.derived: Dict[str, Any] = {}
+        for name, builder in list(_builders.items()):
+            with self._stage(name):
+                self.derived[name] = builder(self)
+
+        self.load_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+
+    def _read(self, filename: str, date_columns: Iterable[str] = (), categories: Iterable[str] = ()) -> pd.DataFrame:
+        df, stats = load_workbook(filename, date_columns, self.data_path, UNUSED_COLUMNS, categories)
+        if stats.source == "excel":
+            logger.info(
+                "Read %s from Excel in %.2fs (%d rows, %d columns%s)",
+                filename, stats.seconds, stats.rows, stats.columns,
+                "" if stats.peak_mb is None else f", peak {stats.peak_mb:.1f} MB",
+            )
+        self.ingest[filename] = stats
+        return df
+
+    @contextmanager
+    def _stage(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.timings[name] = time.perf_counter() - start
+
+    def resolve_country(self, country: str) -> Optional[str]:
+        """
+        The country name for a name, ISO code or initialism in any case and
+        with or without accents, or None if unknown
+        """
+        return self.country_resolver.resolve(country)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "release": self.release,
+            "data_path": self.data_path,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.timings.items()},
+            "ingest": {
+                filename: {
+                    "source": stats.source,
+                    "rows": stats.rows,
+                    "columns": stats.columns,
+                    "seconds": round(stats.seconds, 3),
+                    "peak_mb": None if stats.peak_mb is None else round(stats.peak_mb, 2),
+                }
+                for filename, stats in self.ingest.items()
+            },
+            "assessments": len(self.assessments),
+            "countries": len(self.countries),
+            "trends": len(self.trends),
+            "benchmarks": len(self.benchmarks),
+            "indicators": len(self.indicators),
+        }
+
+
+def register_builder(name: str, builder: Callable[[Dataset], Any]) -> None:
+    """
+    Register per-version state to build from every loaded :class:`Dataset`.
+
+    The state is available as ``dataset.derived[name]``. If a dataset is
+    already loaded its state is built straight away.
+    """
+    _builders[name] = builder
+    with _reload_lock:
+        if _current is not None and name not in _current.derived:
+            _current.derived[name] = builder(_current)
+
+
+def get_dataset() -> Dataset:
+    """
+    The current data release, loaded on first use.
+
+    Handlers should call this once per request and use the returned object
+    throughout, so they see a consistent release even if a reload swaps in
+    a new one mid-request.
+    """
+    dataset = _current
+    if dataset is None:
+        with _reload_lock:
+            if _current is None:
+                _publish(Dataset())
+        dataset = _current
+    return dataset
+
+
+def _publish(dataset: Dataset) -> None:
+    global _current
+    _current = dataset
+    DATASET_LOAD_SECONDS.set(dataset.load_seconds)
+    DATASET_LOADED.set(dataset.loaded_at)
+    DATASET_LOADS.inc()
+    for filename, stats in dataset.ingest.items():
+        WORKBOOK_INGEST_SECONDS.set(stats.seconds, filename)
+        if stats.peak_mb is not None:
+            WORKBOOK_INGEST_PEAK_BYTES.set(stats.peak_mb * 1e6, filename)
+    logger.info("Serving ASCOR release %s (loaded in %.2fs)", dataset.release, dataset.load_seconds)
+
+
+def reload_dataset(data_path: Optional[str] = None) -> Dataset:
+    """Load a release, build all derived state, then atomically swap it in"""
+    with _reload_lock:
+        dataset = Dataset(data_path)
+        _publish(dataset)
+    return dataset
+
+
+def is_loaded() -> bool:
+    return _current is not None
+
+
+def is_reloading() -> bool:
+    return _reload_thread is not None and _reload_thread.is_alive()
+
+
+def reload_dataset_in_background(data_path: Optional[str] = None) -> bool:
+    """
+    Start :func:`reload_dataset` in a background thread.
+
+    Returns False if a reload is already running.
+    """
+    global _reload_thread
+    if is_reloading():
+        return False
+
+    def run():
+        try:
+            reload_dataset(data_path)
+        except Exception:
+            logger.exception("Reloading the ASCOR dataset failed; still serving the previous release")
+
+    _reload_thread = threading.Thread(target=run, name="ascor-reload", daemon=True)
+    _reload_thread.start()
+    return True
+
+
+def watch_data_release(interval: float, stop: threading.Event) -> threading.Thread:
+    """
+    Poll the data directory every ``interval`` seconds and reload on change.
+
+    A change is a new release directory (see ``utils.get_data_path``) or
+    any modified workbook. Set ``stop`` to end the watcher.
+    """
+    def run():
+        while not stop.wait(interval):
+            try:
+                fingerprint = data_fingerprint()
+            except OSError as e:
+                logger.warning("Cannot check the ASCOR data directory: %s", e)
+                continue
+            if _current is not None and fingerprint != _current.fingerprint:
+                logger.info("ASCOR data changed on disk, reloading")
+                reload_dataset_in_background(fingerprint[0])
+
+    thread = threading.Thread(target=run, name="ascor-data-watcher", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_assessments() -> pd.DataFrame:
+    """
+    The assessment results shared by every API version.
+
+    Treat the returned frame as read-only.
+    """
+    return get_dataset().assessments
+
+
+def get_assessments_index() -> CountryYearIndex:
+    """(country, year) index over :func:`get_assessments`"""
+    return get_dataset().assessments_index
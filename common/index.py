@@ -0,0 +1,86 @@
+"""Precomputed lookup indexes over the ASCOR frames."""
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class CountryYearIndex:
+    """
+    Maps (country, assessment year) to the prebuilt slice of a frame.
+
+    Built once at startup with a single groupby, so a request lookup is a
+    dict access instead of a boolean mask over the whole frame.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        country_column: str = "Country",
+        date_column: str = "Assessment date"
+    ):
+        years = df[date_column].dt.year.rename("year")
+        groups = df.groupby([df[country_column], years], sort=False, observed=True)
+        self._slices: Dict[Tuple[str, int], pd.DataFrame] = {
+            (country, int(year)): group for (country, year), group in groups
+        }
+        self._positions: Dict[Tuple[str, int], np.ndarray] = {
+            (country, int(year)): positions for (country, year), positions in groups.indices.items()
+        }
+        self.countries: FrozenSet[str] = frozenset(country for country, _ in self._slices)
+        self._years: Dict[str, List[int]] = {}
+        for country, year in sorted(self._slices):
+            self._years.setdefault(country, []).append(year)
+
+    def get(self, country: str, year: int) -> Optional[pd.DataFrame]:
+        """The rows for ``country`` in ``year``, or None if there are none"""
+        return self._slices.get((country, year))
+
+    def positions(self) -> Dict[Tuple[str, int], np.ndarray]:
+        """
+        Row positions in the frame of every (country, year), for state that
+        keeps the frame's columns as arrays. Treat as read-only.
+        """
+        return self._positions
+
+    def years(self, country: str) -> List[int]:
+        """Assessment years available for ``country``, oldest first"""
+        return self._years.get(country, [])
+
+    def keys(self):
+        return self._slices.keys()
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        return key in self._slices
+
+    def __len__(self) -> int:
+        return len(self._slices)
+
+
+class KeyIndex:
+    """
+    Maps each value of one column to the prebuilt slice of rows holding it.
+
+    Used for the tables joined to the assessments on a single key, such as
+    country name or indicator code.
+    """
+
+    def __init__(self, df: pd.DataFrame, column: str):
+        self._slices: Dict[str, pd.DataFrame] = {
+            key: group for key, group in df.groupby(column, sort=False, observed=True)
+        }
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        return self._slices.get(key)
+
+    def keys(self):
+        return self._slices.keys()
+
+    def items(self):
+        return self._slices.items()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slices
+
+    def __len__(self) -> int:
+        return len(self._slices)
@@ -0,0 +1,170 @@
+"""
+Streaming, column-projected reads of the ASCOR workbooks.
+
+``pd.read_excel`` builds an openpyxl cell object for every cell of a sheet
+and converts all of them before ``usecols`` is applied; dates are then
+parsed in a second pass over the frame. :func:`read_sheet` streams the
+rows as plain values from openpyxl's read-only reader, converts only the
+cells of the columns the caller asks for, and hands them to the parser
+``read_excel`` uses, which parses the dates and categoricals as it builds
+each column. The resulting frame is the one ``read_excel`` followed by
+those conversions would give.
+
+:func:`ingest` also reports what a read cost: rows and columns kept, wall
+time and, when traced, peak memory.
+"""
+import os
+import time
+import tracemalloc
+from typing import Any, Callable, Collection, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+# Columns to read: all of them (None), a collection of header names, or a
+# predicate on the header name, such as :class:`Without`
+Projection = Union[None, Collection[str], Callable[[str], bool]]
+
+# Cell values openpyxl gives for formula errors, which read_excel reads as NaN
+ERROR_VALUES = frozenset(("#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"))
+
+# Peak memory is only traced when asked for: tracemalloc makes a read
+# several times slower
+TRACE_INGEST = os.getenv("ASCOR_TRACE_INGEST", "0") == "1"
+
+
+class Without(NamedTuple):
+    """Projection keeping every column but ``names`` and those starting with one of ``prefixes``"""
+    names: Tuple[str, ...] = ()
+    prefixes: Tuple[str, ...] = ()
+
+    def __call__(self, column: str) -> bool:
+        return column not in self.names and not column.startswith(self.prefixes)
+
+
+class IngestStats(NamedTuple):
+    """What reading one workbook cost"""
+    workbook: str
+    source: str
+    rows: int
+    columns: int
+    seconds: float
+    peak_mb: Optional[float] = None
+
+
+def _convert(value: Any) -> Any:
+    # The same conversion read_excel applies to openpyxl cells
+    if value is None:
+        return ""
+    if type(value) is float:
+        return int(value) if value.is_integer() else value
+    if type(value) is str and value in ERROR_VALUES:
+        return np.nan
+    return value
+
+
+def _selector(projection: Projection) -> Callable[[str], bool]:
+    if projection is None:
+        return lambda name: True
+    if callable(projection):
+        return projection
+    names = frozenset(projection)
+    return names.__contains__
+
+
+def _rows(path: str, projection: Projection) -> Tuple[List[Any], List[List[Any]]]:
+    """The header and data rows of the first sheet, restricted to the projected columns"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_convert(value) for value in next(rows, ())]
+        keep = _selector(projection)
+        # The ASCOR exports start the first header with a byte order mark;
+        # it stays in the column name, as read_excel leaves it, but
+        # projections match the name without it
+        positions = [i for i, value in enumerate(header) if keep(str(value).lstrip("\ufeff"))]
+        width = len(header)
+
+        data, last = [], 0
+        for row in rows:
+            if len(row) < width:
+                row = (*row, *(None,) * (width - len(row)))
+            data.append([_convert(row[i]) for i in positions])
+            # Trailing blank rows are dropped, as read_excel does; a row
+            # counts as blank only if none of its cells, projected or not,
+            # holds a value
+            if any(value is not None and value != "" for value in row):
+                last = len(data)
+        del data[last:]
+    finally:
+        workbook.close()
+    return [header[i] for i in positions], data
+
+
+def read_sheet(
+    path: str,
+    usecols: Projection = None,
+    date_columns: Iterable[str] = (),
+    categories: Iterable[str] = ()
+) -> pd.DataFrame:
+    """
+    The first sheet of the workbook at ``path`` as a DataFrame.
+
+    Only the ``usecols`` columns are converted and kept. ``date_columns``
+    are parsed day first and ``categories`` become categoricals while the
+    columns are built; either may name columns that aren't projected.
+    Column names are always strings (some headers in the ASCOR release are
+    bare numbers).
+    """
+    header, data = _rows(path, usecols)
+    if not header:
+        return pd.DataFrame()
+    names = {str(name) for name in header}
+    parser = TextParser(
+        [header, *data],
+        header=0,
+        parse_dates=[col for col in date_columns if col in names],
+        dayfirst=True,
+        dtype={col: "category" for col in categories if col in names} or None,
+    )
+    df = parser.read()
+    df.columns = df.columns.astype(str)
+    return df
+
+
+def ingest(
+    path: str,
+    usecols: Projection = None,
+    date_columns: Iterable[str] = (),
+    categories: Iterable[str] = (),
+    trace_memory: bool = TRACE_INGEST
+) -> Tuple[pd.DataFrame, IngestStats]:
+    """
+    :func:`read_sheet`, with what it cost.
+
+    Peak memory is traced with tracemalloc when ``trace_memory`` is set,
+    unless something else is already tracing.
+    """
+    traced = trace_memory and not tracemalloc.is_tracing()
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        df = read_sheet(path, usecols, date_columns, categories)
+        seconds = time.perf_counter() - start
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6 if traced else None
+    finally:
+        if traced:
+            tracemalloc.stop()
+    stats = IngestStats(
+        workbook=os.path.basename(path),
+        source="excel",
+        rows=len(df),
+        columns=len(df.columns),
+        seconds=seconds,
+        peak_mb=peak_mb,
+    )
+    return df, stats
@@ -0,0 +1,53 @@
+"""Sub-apps that are imported, and get their data, on first use.
+
+Importing a versioned app pulls in pandas and its transformers, and its
+handlers need the dataset. Mounting the apps through :class:`LazyApp`
+keeps ``main`` cheap to import, so ``/``, ``/ready`` and the docs answer
+straight away while the apps and data load in the background.
+"""
+import asyncio
+import importlib
+import threading
+import time
+from typing import Optional
+
+
+class LazyApp:
+    """ASGI app standing in for ``"module:attribute"`` until it is first needed"""
+
+    def __init__(self, import_path: str, needs_dataset: bool = True):
+        self.import_path = import_path
+        self.needs_dataset = needs_dataset
+        self.load_seconds: Optional[float] = None
+        self._app = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._app is not None
+
+    def load(self):
+        """Import the real app (thread-safe; only the first call does any work)"""
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    start = time.perf_counter()
+                    module_name, attribute = self.import_path.split(":")
+                    app = getattr(importlib.import_module(module_name), attribute)
+                    self.load_seconds = time.perf_counter() - start
+                    self._app = app
+        return self._app
+
+    async def __call__(self, scope, receive, send):
+        app = self._app
+        if app is None:
+            app = await asyncio.to_thread(self.load)
+
+        if scope["type"] == "http" and self.needs_dataset:
+            # The handlers read the dataset synchronously; make sure the first
+            # load happens off the event loop so other requests keep flowing
+            from common.datastore import get_dataset, is_loaded
+            if not is_loaded():
+                await asyncio.to_thread(get_dataset)
+
+        await app(scope, receive, send)
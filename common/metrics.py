@@ -0,0 +1,239 @@
+"""In-process Prometheus-style metrics.
+
+Counters, gauges and histograms are plain dicts of numbers with no locks.
+They are updated from the event loop and from other threads: work pool
+stage timers and waits, response caches filled by pool renders, reloads
+and streamed exports. A new label's entry is created atomically
+(``dict.setdefault``), so it is never replaced by a concurrent update. Two
+threads updating the same entry at once can still lose an increment; that
+is an acceptable trade for instrumentation that costs well under a
+microsecond per update. ``render_metrics`` produces the Prometheus text
+exposition format served at ``/metrics``.
+"""
+import bisect
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labelnames: Sequence[str], values: Tuple) -> str:
+    if not labelnames:
+        return ""
+    pairs = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(labelnames, values)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        for labels, value in list(self._values.items()):
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        self._values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: Dict[Tuple, List] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            # Two threads can both miss; setdefault keeps the first entry, so
+            # neither observation lands in one that is then replaced
+            entry = self._values.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return entry[2] if entry else 0
+
+    def samples(self):
+        for labels, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield (
+                    self.name + "_bucket",
+                    _labels(self.labelnames + ("le",), labels + (le,)),
+                    cumulative
+                )
+            yield self.name + "_sum", _labels(self.labelnames, labels), total
+            yield self.name + "_count", _labels(self.labelnames, labels), count
+
+
+REGISTRY: List = []
+
+REQUESTS = Counter(
+    "ascor_requests_total", "HTTP requests handled", ("app", "route", "method", "status")
+)
+REQUEST_LATENCY = Histogram(
+    "ascor_request_duration_seconds", "Time to handle an HTTP request", ("app", "route")
+)
+STAGE_LATENCY = Histogram(
+    "ascor_stage_duration_seconds",
+    "Time spent in a stage of request handling (lookup, transform, serialize)",
+    ("app", "stage")
+)
+CACHE_REQUESTS = Counter(
+    "ascor_cache_requests_total", "Response cache lookups", ("cache", "result")
+)
+CACHE_EVICTIONS = Counter(
+    "ascor_cache_evictions_total", "Responses dropped from a cache, for space or age", ("cache", "reason")
+)
+CACHE_BYTES = Gauge("ascor_cache_bytes", "Size of the response bodies held in a cache", ("cache",))
+CACHE_ENTRIES = Gauge("ascor_cache_entries", "Responses held in a cache", ("cache",))
+COALESCED_REQUESTS = Counter(
+    "ascor_coalesced_requests_total",
+    "Requests that waited for an identical computation already in progress instead of running their own",
+    ("flight",)
+)
+POOL_IN_FLIGHT = Gauge(
+    "ascor_pool_in_flight", "Blocking tasks queued or running in the work pool"
+)
+POOL_WAIT = Histogram(
+    "ascor_pool_wait_seconds", "Time blocking tasks waited for a work pool thread"
+)
+POOL_REJECTED = Counter(
+    "ascor_pool_rejected_total", "Requests turned away with a 503 because the work pool was full"
+)
+DATASET_LOAD_SECONDS = Gauge(
+    "ascor_dataset_load_seconds", "Time taken to load the data release being served"
+)
+DATASET_LOADED = Gauge(
+    "ascor_dataset_loaded_timestamp_seconds", "When the data release being served was loaded"
+)
+DATASET_LOADS = Counter("ascor_dataset_loads_total", "Data releases loaded, including reloads")
+WORKBOOK_INGEST_SECONDS = Gauge(
+    "ascor_workbook_ingest_seconds", "Time taken to read each workbook of the release being served", ("workbook",)
+)
+WORKBOOK_INGEST_PEAK_BYTES = Gauge(
+    "ascor_workbook_ingest_peak_bytes", "Peak memory traced while parsing each workbook (ASCOR_TRACE_INGEST=1)", ("workbook",)
+)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(app: str, stage: str):
+    """Record the time spent in the ``with`` block as a stage of ``app``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, app, stage)
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("ASCOR_PROFILING") == "1"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per mounted app and route.
+
+    The route is the matched path template (e.g.
+    ``/v3/country-metrics/{country}/{assessment_year}``) so label cardinality
+    stays bounded. When ``ASCOR_PROFILING=1``, a request sent with an
+    ``X-Profile: 1`` header is run under cProfile and the hottest functions
+    are logged.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = None
+        if profiling_enabled() and (b"x-profile", b"1") in scope.get("headers", []):
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                _log_profile(profiler, scope["path"])
+
+            route = scope.get("route")
+            prefix = scope.get("root_path", "")
+            template = prefix + route.path if route is not None else "unmatched"
+            app = prefix.rstrip("/").rsplit("/", 1)[-1] or "root"
+            REQUESTS.inc(app, template, scope["method"], status)
+            REQUEST_LATENCY.observe(elapsed, app, template)
+
+
+def _log_profile(profiler: cProfile.Profile, path: str) -> None:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+    logger.info("Profile of %s:\n%s", path, out.getvalue())
@@ -0,0 +1,191 @@
+"""
+A bounded thread pool for the blocking part of request handling.
+
+The handlers are ``async def``, so pandas lookups and tree transforms run
+inline would hold the event loop and stall every other request, health
+checks included. Handlers hand that work to :func:`run_blocking` instead,
+and keep cache reads on the loop.
+
+The pool has ``ASCOR_POOL_THREADS`` threads and admits at most
+``ASCOR_POOL_QUEUE`` further tasks waiting for one. Past that, requests
+are turned away straight away with a 503 and a ``Retry-After`` header
+rather than queueing without bound. ``ASCOR_POOL_THREADS=0`` runs the
+work inline on the event loop.
+
+The work is mostly pure-Python under the GIL, so extra threads add little
+throughput and make the loop itself slower to get scheduled; use pre-fork
+workers to use more cores.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Hashable, Iterator, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from .metrics import COALESCED_REQUESTS, POOL_IN_FLIGHT, POOL_REJECTED, POOL_WAIT
+
+T = TypeVar("T")
+
+DEFAULT_THREADS = 2
+DEFAULT_QUEUE = 64
+RETRY_AFTER_SECONDS = 1
+
+
+class ServiceOverloaded(HTTPException):
+    def __init__(self, in_flight: int):
+        super().__init__(
+            status_code=503,
+            detail={
+                "message": "The server is busy, please retry shortly",
+                "details": {"in_flight": in_flight}
+            },
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+
+class WorkPool:
+    """Runs blocking calls on ``threads`` threads with at most ``queue_limit`` waiting"""
+
+    def __init__(self, threads: int = DEFAULT_THREADS, queue_limit: int = DEFAULT_QUEUE):
+        self.threads = threads
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="ascor-pool") if threads > 0 else None
+        self._in_flight = 0
+        # Tasks finish on the pool threads, so the count is shared with them
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            POOL_IN_FLIGHT.set(self._in_flight)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self._executor is None:
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            if self._in_flight >= self.threads + self.queue_limit:
+                POOL_REJECTED.inc()
+                raise ServiceOverloaded(self._in_flight)
+            self._in_flight += 1
+            POOL_IN_FLIGHT.set(self._in_flight)
+
+        submitted = time.perf_counter()
+
+        def task():
+            POOL_WAIT.observe(time.perf_counter() - submitted)
+            return fn(*args, **kwargs)
+
+        # Released when the task finishes, not when the request gives up on
+        # it, so abandoned work still counts against the limit while it runs
+        future = self._executor.submit(task)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+_pool: Optional[WorkPool] = None
+
+
+def configure_pool(threads: Optional[int] = None, queue_limit: Optional[int] = None) -> WorkPool:
+    """Replace the shared pool; sizes default to ASCOR_POOL_THREADS / ASCOR_POOL_QUEUE"""
+    global _pool
+    if threads is None:
+        threads = int(os.getenv("ASCOR_POOL_THREADS", DEFAULT_THREADS))
+    if queue_limit is None:
+        queue_limit = int(os.getenv("ASCOR_POOL_QUEUE", DEFAULT_QUEUE))
+    previous, _pool = _pool, WorkPool(threads, queue_limit)
+    if previous is not None:
+        previous.shutdown()
+    return _pool
+
+
+def get_pool() -> WorkPool:
+    return _pool if _pool is not None else configure_pool()
+
+
+async def run_blocking(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run ``fn`` on the shared work pool, or fail with 503 if it is full"""
+    return await get_pool().run(fn, *args, **kwargs)
+
+
+_DONE = object()
+
+
+async def iterate_blocking(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """
+    ``iterator`` as an async iterator whose items are each produced on the
+    shared work pool.
+
+    Streaming responses use it so their chunks share the pool's limits;
+    Starlette would otherwise run a plain iterator on its own threadpool.
+    The first item is produced before this returns, so a full pool fails
+    the request with a 503 rather than cutting off a started response.
+    """
+    first = await run_blocking(next, iterator, _DONE)
+
+    async def items() -> AsyncIterator[T]:
+        item = first
+        while item is not _DONE:
+            yield item
+            item = await run_blocking(next, iterator, _DONE)
+
+    return items()
+
+
+class SingleFlight:
+    """
+    Shares one in-progress blocking call among concurrent identical requests.
+
+    The first caller for a key starts ``fn`` on the work pool; callers with
+    the same key arriving before it finishes await that call instead of
+    starting their own, and all get its result or its exception. Nothing is
+    kept once it finishes, so pair it with a cache for later requests.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: Hashable, fn: Callable[..., T], *args, **kwargs) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_blocking(fn, *args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            COALESCED_REQUESTS.inc(self.name)
+        # Shielded, so a caller that disconnects doesn't cancel the others' call
+        return await asyncio.shield(task)
+
+    async def fill(self, cached: Optional[T], key: Hashable, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        ``cached`` if there is one, else :meth:`run`.
+
+        This is how the flight pairs with a cache: a hit is served straight
+        from the event loop, and a miss is rendered on the pool, once for
+        all the requests for it that arrive while it renders.
+        """
+        if cached is not None:
+            return cached
+        return await self.run(key, fn, *args, **kwargs)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,128 @@
+"""Pre-fork multi-worker serving that shares one loaded dataset.
+
+``uvicorn --workers N`` spawns fresh interpreters, so every worker imports
+the apps and loads, melts, indexes and renders the whole dataset again.
+Here the parent process does that work once, freezes the resulting objects
+out of the garbage collector's reach (``gc.freeze``) and then forks the
+workers. The frames, indexes and pre-rendered response caches are shared
+copy-on-write with the parent: memory stays close to flat as workers are
+added, and a worker is ready to serve as soon as it has forked.
+
+POSIX only, since it relies on ``os.fork``.
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+import uvicorn
+
+
+logger = logging.getLogger(__name__)
+
+# Minimum time between restarts of a worker that keeps dying
+RESTART_BACKOFF = 1.0
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, **uvicorn_options) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, **uvicorn_options)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, **uvicorn_options) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, **uvicorn_options)
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve_prefork(
+    app,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 2,
+    preload: Optional[Callable[[], None]] = None,
+    **uvicorn_options
+) -> None:
+    """
+    Run ``preload``, then serve ``app`` from ``workers`` forked processes.
+
+    ``preload`` does all the loading in the parent, so what it builds is
+    shared: ``main.warm_up`` imports the lazily mounted apps and loads the
+    dataset, or only opens the snapshot in snapshot mode. It defaults to
+    loading the dataset.
+
+    Dead workers are restarted; SIGINT/SIGTERM are forwarded to all
+    workers, which shut down gracefully.
+    """
+    if preload is None:
+        from .datastore import get_dataset as preload
+
+    start = time.perf_counter()
+    preload()
+    logger.info("Preloaded in %.2fs; forking %d workers", time.perf_counter() - start, workers)
+
+    # Everything allocated so far is long-lived and read-only. Moving it to
+    # the permanent generation stops collections in the workers from
+    # touching (and so copying) the shared pages.
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind(host, port)
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        children[_spawn(app, sock, **uvicorn_options)] = time.monotonic()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+
+        logger.warning("Worker %d exited with status %d; restarting", pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started < RESTART_BACKOFF:
+            time.sleep(RESTART_BACKOFF)
+        children[_spawn(app, sock, **uvicorn_options)] = time.monotonic()
+
+    sock.close()
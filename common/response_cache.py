@@ -0,0 +1,207 @@
+"""Cache of fully serialized responses with strong ETags.
+
+The ASCOR data only changes between releases, so a rendered response for
+a given set of path parameters can be stored as bytes and sent back as a
+raw ``Response``. This skips the transformer as well as FastAPI's
+``response_model`` re-validation and re-serialization on repeat requests.
+Compressed variants are stored on the entry the first time a client asks
+for them.
+
+Each cache holds at most ``ASCOR_CACHE_MAX_MB`` of bodies and their
+compressed variants (default 64), dropping the least recently used past that, and, if ``ASCOR_CACHE_TTL``
+is set, drops entries older than that many seconds.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+
+from .compression import compress, negotiate_encoding
+from .metrics import CACHE_BYTES, CACHE_ENTRIES, CACHE_EVICTIONS, CACHE_REQUESTS
+from .offload import run_blocking
+
+DEFAULT_MAX_BYTES = int(float(os.getenv("ASCOR_CACHE_MAX_MB", "64")) * 1e6)
+DEFAULT_TTL = float(os.getenv("ASCOR_CACHE_TTL", "0")) or None
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str
+    # Content coding -> compressed body, filled on first use
+    encoded: Dict[str, bytes]
+    # The cache holding the entry, and its key there, so that compressed
+    # variants count against that cache's budget
+    cache: Optional["ResponseCache"] = None
+    key: Hashable = None
+
+    def encode(self, encoding: str) -> bytes:
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = compress(self.body, encoding)
+            if self.cache is None:
+                body = self.encoded.setdefault(encoding, body)
+            else:
+                body = self.cache._add_variant(self, encoding, body)
+        return body
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        """Strong ETags must differ between content codings of a body"""
+        return self.etag if encoding is None else self.etag[:-1] + "-" + encoding + '"'
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an ``If-None-Match`` header matches ``etag``.
+
+    If-None-Match uses the weak comparison, so a ``W/`` prefix is ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResponseCache:
+    """
+    Lazily filled map from request key to a serialized body, bounded in size.
+
+    Least recently used entries are evicted once the bodies and their
+    compressed variants exceed ``max_bytes``. With a ``ttl``, entries older than that many
+    seconds count as misses and are dropped. Lookups come from the event
+    loop and renders from the work pool, so access is locked.
+    """
+
+    def __init__(
+        self,
+        name: str = "responses",
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None
+    ):
+        self.name = name
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = DEFAULT_TTL if ttl is None else (ttl or None)
+        # key -> (entry, size, expiry time or None), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[CachedResponse, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[2] is not None and item[2] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                CACHE_EVICTIONS.inc(self.name, "expired")
+                item = None
+            if item is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        CACHE_REQUESTS.inc(self.name, "miss" if item is None else "hit")
+        return None if item is None else item[0]
+
+    def put(self, key: Hashable, body: bytes, media_type: str = "application/json") -> CachedResponse:
+        size = len(body)
+        if size > self.max_bytes:
+            # Served, but never worth evicting everything else for
+            return CachedResponse(body=body, etag=make_etag(body), media_type=media_type, encoded={})
+        entry = CachedResponse(
+            body=body, etag=make_etag(body), media_type=media_type, encoded={}, cache=self, key=key
+        )
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (entry, size, expires)
+            self._bytes += size
+            self._evict()
+            self._update_gauges()
+        return entry
+
+    def _add_variant(self, entry: CachedResponse, encoding: str, body: bytes) -> bytes:
+        """Store a compressed variant of ``entry`` and count it against the budget"""
+        with self._lock:
+            stored = entry.encoded.setdefault(encoding, body)
+            item = self._entries.get(entry.key)
+            # Already stored by another request, or the entry has since left
+            # the cache and no longer counts
+            if stored is not body or item is None or item[0] is not entry:
+                return stored
+            self._entries[entry.key] = (entry, item[1] + len(body), item[2])
+            self._bytes += len(body)
+            self._evict()
+            self._update_gauges()
+        return body
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+            CACHE_EVICTIONS.inc(self.name, "size")
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        CACHE_BYTES.set(self._bytes, self.name)
+        CACHE_ENTRIES.set(len(self._entries), self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+async def cached_response(
+    request: Request,
+    entry: CachedResponse,
+    vary: Sequence[str] = ("Accept-Encoding",)
+) -> Response:
+    """
+    Send a cached body, compressed if the client accepts it, or a 304 if
+    the client already has this version.
+
+    A compressed variant missing from the entry is built on the work pool.
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), len(entry.body))
+    etag = entry.variant_etag(encoding)
+    headers = {"ETag": etag, "Vary": ", ".join(vary)}
+
+    # If-None-Match is a weak comparison: any coding of this body matches
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    body = entry.body
+    if encoding is not None:
+        body = entry.encoded.get(encoding)
+        if body is None:
+            body = await run_blocking(entry.encode, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,55 @@
+"""
+The JSON response class every app uses by default.
+
+Bodies are encoded with orjson, which serializes NumPy arrays and scalars
+natively and writes NaN as null, so values read straight from a DataFrame
+can be returned without FastAPI's ``jsonable_encoder`` walk. The few types
+orjson doesn't know (pandas timestamps and missing-value markers, Pydantic
+models, sets) go through :func:`_default`.
+"""
+import sys
+from datetime import date
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    # pandas is only imported by the versioned apps, so only look for its
+    # types when it has been
+    pandas = sys.modules.get("pandas")
+    if pandas is not None and (obj is pandas.NaT or obj is pandas.NA):
+        return None
+    if isinstance(obj, date):
+        # pandas.Timestamp, a datetime subclass orjson won't serialize
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        # NumPy scalars and arrays of a type orjson doesn't handle natively
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """``content`` as compact UTF-8 JSON, with NaN and missing values as null"""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded with :func:`dumps`.
+
+    Handlers that build their content from pandas values should return an
+    instance directly rather than the content, so FastAPI doesn't walk it
+    with ``jsonable_encoder`` first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,244 @@
+"""
+Prebuilt snapshots of the rendered /country-metrics responses.
+
+A snapshot is a SQLite database holding, for every (country, year), the
+v2 /country-metrics JSON body and the v3 body in each of its formats, with
+their ETags and compressed variants, indexed on (version, format, country,
+year). It is built once from the workbooks, with pandas:
+
+    python -m common.snapshot --out ascor.sqlite [--data-path DIR]
+
+and served by ``main.py --snapshot ascor.sqlite`` (or ``ASCOR_SNAPSHOT``),
+which answers those endpoints with a primary key lookup and never imports
+pandas, openpyxl or the versioned apps. This module only imports pandas
+when building.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .compression import ENCODERS
+from .countries import CountryResolver
+from .response_cache import CachedResponse, make_etag
+
+# Bumped whenever the schema changes, so an old snapshot is refused
+# rather than misread
+SCHEMA_VERSION = "3"
+
+SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE country_metrics (
+    version TEXT NOT NULL,
+    format TEXT NOT NULL,
+    country TEXT NOT NULL,
+    assessment_year INTEGER NOT NULL,
+    media_type TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT NOT NULL,
+    br BLOB,
+    gzip BLOB,
+    PRIMARY KEY (version, format, country, assessment_year)
+) WITHOUT ROWID;
+CREATE TABLE countries (
+    name TEXT PRIMARY KEY,
+    iso_code TEXT
+) WITHOUT ROWID;
+"""
+
+COUNTRY_METRICS_SQL = (
+    "SELECT media_type, body, etag, br, gzip FROM country_metrics "
+    "WHERE version = ? AND format = ? AND country = ? AND assessment_year = ?"
+)
+META_SQL = "SELECT key, value FROM meta"
+COUNTRIES_SQL = "SELECT name, iso_code FROM countries"
+
+POOL_SIZE = int(os.getenv("ASCOR_SNAPSHOT_CONNECTIONS", "4"))
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class Snapshot:
+    """
+    Read-only access to a snapshot database.
+
+    Connections are opened on demand, up to ``pool_size`` of them, and
+    reused; each keeps its compiled statements, so after the first
+    request a lookup binds and steps an already-prepared query.
+    """
+
+    def __init__(self, path: str, pool_size: int = POOL_SIZE):
+        if not os.path.isfile(path):
+            raise SnapshotError(f"No snapshot at {path}")
+        self.path = path
+        self.pool_size = max(pool_size, 1)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+        start = time.perf_counter()
+        with self.connection() as conn:
+            self.meta: Dict[str, str] = dict(conn.execute(META_SQL).fetchall())
+            if self.meta.get("schema_version") != SCHEMA_VERSION:
+                raise SnapshotError(
+                    f"{path} has schema version {self.meta.get('schema_version')}, expected {SCHEMA_VERSION}; rebuild it"
+                )
+            self.country_resolver = CountryResolver(conn.execute(COUNTRIES_SQL).fetchall())
+        # The v3 formats rendered into the snapshot, JSON first
+        self.formats: List[str] = self.meta.get("formats", "json").split(",")
+        self.load_seconds = time.perf_counter() - start
+
+    def _connect(self) -> sqlite3.Connection:
+        # immutable: the file is never written while served, so SQLite can
+        # skip locking and change detection
+        return sqlite3.connect(
+            f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.pool_size
+                if can_open:
+                    self._opened += 1
+            conn = self._connect() if can_open else self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def country_metrics(
+        self, version: str, country: str, assessment_year: int, fmt: str = "json"
+    ) -> Optional[CachedResponse]:
+        """
+        The rendered body for one country, by any name the resolver knows,
+        and year, in ``fmt``, or None if there is none
+        """
+        name = self.country_resolver.resolve(country) or country
+        with self.connection() as conn:
+            row = conn.execute(COUNTRY_METRICS_SQL, (version, fmt, name, assessment_year)).fetchone()
+        if row is None:
+            return None
+        media_type, body, etag, br, gz = row
+        encoded = {coding: variant for coding, variant in (("br", br), ("gzip", gz)) if variant is not None}
+        return CachedResponse(body=body, etag=etag, media_type=media_type, encoded=encoded)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "snapshot": self.path,
+            "release": self.meta.get("release"),
+            "built_at": float(self.meta.get("built_at", 0)),
+            "responses": int(self.meta.get("responses", 0)),
+            "formats": self.formats,
+            "load_seconds": round(self.load_seconds, 3),
+        }
+
+
+_snapshot: Optional[Snapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> Snapshot:
+    """The snapshot named by ``ASCOR_SNAPSHOT``, opened on first use"""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                path = os.getenv("ASCOR_SNAPSHOT")
+                if not path:
+                    raise SnapshotError("ASCOR_SNAPSHOT is not set")
+                _snapshot = Snapshot(path)
+    return _snapshot
+
+
+def build_snapshot(out: str, data_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load a release and write every v2 /country-metrics body, and every v3
+    one in each available format, to ``out``.
+
+    The bodies are rendered by the same code the versioned apps run, so a
+    snapshot serves byte-identical responses. The file is written next to
+    ``out`` and renamed into place, so a server never opens a partial one.
+    """
+    from .datastore import Dataset
+    from v3.formats import ENCODERS as FORMAT_ENCODERS, FORMAT_MEDIA_TYPES, available_formats
+    # Importing the state modules registers the builders the Dataset runs
+    from v2.state import V2State  # noqa: F401
+    from v3.state import V3State  # noqa: F401
+
+    start = time.perf_counter()
+    dataset = Dataset(data_path)
+    v2, v3 = dataset.derived["v2"], dataset.derived["v3"]
+
+    formats = available_formats()
+    rows = []
+    for country, year in sorted(dataset.assessments_index.keys()):
+        v3_body = v3.country_metrics_entry(country, year).body
+        # Other formats are re-encodings of the JSON document, as in v3
+        document = json.loads(v3_body)
+        bodies = [
+            ("v2", "json", v2.plan.build(v2.row(country, year), country, year).model_dump_json().encode()),
+            ("v3", "json", v3_body),
+            *(("v3", fmt, FORMAT_ENCODERS[fmt](document)) for fmt in formats if fmt != "json"),
+        ]
+        for version, fmt, body in bodies:
+            rows.append((
+                version, fmt, country, year, FORMAT_MEDIA_TYPES[fmt], body, make_etag(body),
+                ENCODERS["br"](body) if "br" in ENCODERS else None,
+                ENCODERS["gzip"](body),
+            ))
+
+    partial = out + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    conn = sqlite3.connect(partial)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.executemany("INSERT INTO country_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("INSERT INTO countries VALUES (?, ?)", list(dataset.country_resolver.iso_codes.items()))
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("schema_version", SCHEMA_VERSION),
+                ("release", dataset.release),
+                ("data_path", dataset.data_path),
+                ("built_at", repr(time.time())),
+                ("responses", str(len(rows))),
+                ("formats", ",".join(formats)),
+            ])
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(partial, out)
+
+    return {
+        "snapshot": out,
+        "release": dataset.release,
+        "responses": len(rows),
+        "size_mb": round(os.path.getsize(out) / 1e6, 2),
+        "build_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import warnings
+
+    parser = argparse.ArgumentParser(description="Build a snapshot of the /country-metrics responses")
+    parser.add_argument("--out", default="ascor.sqlite", help="snapshot file to write")
+    parser.add_argument("--data-path", help="release directory (defaults to the one the API would serve)")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    print(json.dumps(build_snapshot(args.out, args.data_path), indent=2))
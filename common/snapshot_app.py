@@ -0,0 +1,75 @@
+"""
+The /v2 and /v3 apps of the snapshot serving mode (see :mod:`common.snapshot`).
+
+Only /country-metrics is served, for the full tree, plus v3's
+/countries/suggest; v3 serves the tree in every format rendered into the
+snapshot, each with its prebuilt compressed variants. Countries are
+resolved as in the versioned apps and errors have the same shape. Nothing
+here imports pandas.
+"""
+from typing import Optional
+
+from fastapi import FastAPI, Query, Request
+from .response_cache import cached_response
+from .responses import FastJSONResponse
+from .snapshot import get_snapshot
+from v2.exceptions import DataNotFoundError as V2DataNotFoundError
+from v3.exceptions import ASCORException, DataNotFoundError, DataValidationError
+from v3.formats import FORMAT_MEDIA_TYPES, negotiate_format
+
+v2_app = FastAPI(default_response_class=FastJSONResponse)
+v3_app = FastAPI(default_response_class=FastJSONResponse)
+
+@v2_app.get("/")
+async def v2_root():
+    return {"version": "v2"}
+
+@v2_app.get("/country-metrics/{country}/{assessment_year}")
+async def get_v2_country_metrics(country: str, assessment_year: int, request: Request):
+    entry = get_snapshot().country_metrics("v2", country, assessment_year)
+    if entry is None:
+        raise V2DataNotFoundError(
+            message=f"No data found for country: {country} and year: {assessment_year}"
+        )
+    return await cached_response(request, entry)
+
+@v3_app.get("/")
+async def v3_root():
+    return {"version": "v3"}
+
+@v3_app.get("/countries/suggest")
+async def suggest_countries(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100)):
+    resolver = get_snapshot().country_resolver
+    return FastJSONResponse([
+        {"name": name, "iso_code": resolver.iso_codes[name]} for name in resolver.suggest(q, limit)
+    ])
+
+@v3_app.get("/country-metrics/{country}/{assessment_year}")
+async def get_v3_country_metrics(
+    country: str,
+    assessment_year: int,
+    request: Request,
+    format: Optional[str] = Query(None, description="json, msgpack, ndjson or columnar; overrides the Accept header"),
+    pillars: Optional[str] = Query(None),
+    depth: str = Query("metric"),
+    include_sources: bool = Query(True)
+):
+    """The full Pillar/Area/Indicator/Metric tree of a country and assessment year."""
+    if pillars is not None or depth != "metric" or not include_sources:
+        raise DataValidationError(
+            message="Partial trees are not available when serving a snapshot",
+            details={"supported": {"pillars": None, "depth": "metric", "include_sources": True}}
+        )
+    snapshot = get_snapshot()
+    fmt = format if format is not None else negotiate_format(request.headers.get("accept"), snapshot.formats)
+    if fmt not in snapshot.formats:
+        raise ASCORException(
+            status_code=406,
+            message=f"Unsupported format: {format or request.headers.get('accept')}",
+            details={"supported": {name: FORMAT_MEDIA_TYPES[name] for name in snapshot.formats}}
+        )
+
+    entry = snapshot.country_metrics("v3", country, assessment_year, fmt)
+    if entry is None:
+        raise DataNotFoundError(message=f"No data found for country: {country} and year: {assessment_year}")
+    return await cached_response(request, entry, vary=("Accept", "Accept-Encoding"))
@@ -1,21 +1,193 @@
+import importlib
+import logging
+import os
+import secrets
+import sys
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+
 import uvicorn
-from fastapi import FastAPI
-from v1.app import app as app_v1
-from v2.app import app as app_v2
-from v3.app import app as app_v3
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from common.compression import MIN_SIZE
+from common.lazy import LazyApp
+from common.metrics import MetricsMiddleware, render_metrics
+from common.responses import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# With ASCOR_SNAPSHOT set, /v2 and /v3 /country-metrics are answered from a
+# prebuilt snapshot (see common/snapshot.py) and pandas is never imported
+SNAPSHOT_PATH = os.getenv("ASCOR_SNAPSHOT")
+
+# The versioned apps (and pandas, which they import) are only loaded when
+# first used or by the background warm-up, so importing this module is cheap
+if SNAPSHOT_PATH:
+    SUB_APPS = {
+        "/v2": LazyApp("common.snapshot_app:v2_app", needs_dataset=False),
+        "/v3": LazyApp("common.snapshot_app:v3_app", needs_dataset=False),
+    }
+else:
+    SUB_APPS = {
+        "/v1": LazyApp("v1.app:app"),
+        "/v2": LazyApp("v2.app:app"),
+        "/v3": LazyApp("v3.app:app"),
+    }
+
+_ready = threading.Event()
+_warm_up_error: Optional[str] = None
 
-app = FastAPI()
+def warm_up():
+    """Import the versioned apps, then load the dataset (or open the snapshot)"""
+    global _warm_up_error
+    try:
+        for sub_app in SUB_APPS.values():
+            sub_app.load()
+        if SNAPSHOT_PATH:
+            from common.snapshot import get_snapshot
+            get_snapshot()
+        else:
+            from common.datastore import get_dataset
+            get_dataset()
+    except Exception as e:
+        _warm_up_error = str(e)
+        logger.exception("Warm-up failed")
+        raise
+    _ready.set()
 
-app.mount("/v1", app_v1)
-app.mount("/v2", app_v2)
-app.mount("/v3", app_v3)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start answering straight away; /ready reports when the data is in.
+    # Requests to a sub-app that arrive earlier wait for it instead.
+    threading.Thread(target=warm_up, name="ascor-warm-up", daemon=True).start()
+
+    # Poll for a new data release every ASCOR_WATCH_INTERVAL seconds (off by
+    # default). The datastore imports pandas, so a snapshot server never does
+    stop_watching = threading.Event()
+    interval = float(os.getenv("ASCOR_WATCH_INTERVAL", "0"))
+    if interval > 0 and not SNAPSHOT_PATH:
+        from common.datastore import watch_data_release
+        watch_data_release(interval, stop_watching)
+
+    yield
+    stop_watching.set()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+# Compresses the responses that are not cached pre-compressed; those
+# already carry a Content-Encoding and are passed through
+app.add_middleware(GZipMiddleware, minimum_size=MIN_SIZE)
+app.add_middleware(MetricsMiddleware)
+
+for prefix, sub_app in SUB_APPS.items():
+    app.mount(prefix, sub_app)
 
 @app.get("/")
 async def read_root():
     return {
         "message": "ASCOR API",
-        "versions": ["v1", "v2", "v3"]
+        "versions": [prefix.strip("/") for prefix in SUB_APPS]
     }
 
+@app.get("/ready")
+async def ready():
+    """200 once the apps are imported and the dataset is loaded, 503 until then"""
+    apps = {prefix.strip("/"): sub_app.loaded for prefix, sub_app in SUB_APPS.items()}
+    if not _ready.is_set():
+        status = "failed" if _warm_up_error else "starting"
+        return FastJSONResponse(
+            {"status": status, "error": _warm_up_error, "apps": apps},
+            status_code=503
+        )
+
+    if SNAPSHOT_PATH:
+        from common.snapshot import get_snapshot
+        snapshot = get_snapshot()
+        return {
+            "status": "ready",
+            "apps": apps,
+            "release": snapshot.meta.get("release"),
+            "load_seconds": round(snapshot.load_seconds, 3),
+            "snapshot": snapshot.path,
+        }
+
+    from common.datastore import get_dataset
+    dataset = get_dataset()
+    return {
+        "status": "ready",
+        "apps": apps,
+        "release": dataset.release,
+        "load_seconds": round(dataset.load_seconds, 3),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, stage, cache and dataset metrics in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def _check_admin_token(token: Optional[str]):
+    expected = os.getenv("ASCOR_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ASCOR_ADMIN_TOKEN is not set)")
+    if not token or not secrets.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/dataset")
+async def dataset_info(x_admin_token: Optional[str] = Header(None)):
+    _check_admin_token(x_admin_token)
+    if SNAPSHOT_PATH:
+        from common.snapshot import get_snapshot
+        return get_snapshot().info()
+    from common.datastore import get_dataset, is_reloading
+    dataset = get_dataset()
+    caches = {
+        name: state.metrics_cache.stats()
+        for name, state in dataset.derived.items() if hasattr(state, "metrics_cache")
+    }
+    return {**dataset.info(), "reloading": is_reloading(), "caches": caches}
+
+@app.post("/admin/reload", status_code=202)
+async def reload_data(x_admin_token: Optional[str] = Header(None)):
+    """
+    Load the latest data release in the background and swap it in when ready.
+
+    Requests keep being served from the current release until the swap.
+    """
+    _check_admin_token(x_admin_token)
+    if SNAPSHOT_PATH:
+        raise HTTPException(status_code=409, detail="Serving a snapshot; build a new one to change the data")
+    from common.datastore import get_dataset, is_reloading, reload_dataset_in_background
+    started = reload_dataset_in_background()
+    return {"started": started, "reloading": is_reloading(), "current": get_dataset().info()}
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", log_level="info")
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the ASCOR API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="with more than one, the dataset is loaded once and shared by forked workers"
+    )
+    parser.add_argument(
+        "--snapshot",
+        help="serve /v2 and /v3 /country-metrics from this snapshot (built with python -m common.snapshot)"
+    )
+    args = parser.parse_args()
+
+    serving = sys.modules[__name__]
+    if args.snapshot:
+        # The app is assembled at import time, so import it afresh in snapshot mode
+        os.environ["ASCOR_SNAPSHOT"] = args.snapshot
+        serving = importlib.import_module("main")
+
+    if args.workers > 1:
+        from common.prefork import serve_prefork
+        serve_prefork(
+            serving.app, host=args.host, port=args.port, workers=args.workers, preload=serving.warm_up,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(serving.app, host=args.host, port=args.port, log_level="info")
\ No newline at end of file
@@ -1,9 +1,35 @@
 import os
+from datetime import datetime
+
+DATA_RELEASE_PREFIX = "TPI ASCOR data - "
 
 def get_project_root() -> str:
     """Returns the absolute path to the project root directory"""
     return os.path.dirname(os.path.abspath(__file__))
 
+def _release_date(folder: str) -> datetime:
+    """Release folders are suffixed with their date, e.g. 'TPI ASCOR data - 13012025'"""
+    try:
+        return datetime.strptime(folder[len(DATA_RELEASE_PREFIX):], "%d%m%Y")
+    except ValueError:
+        return datetime.min
+
 def get_data_path() -> str:
-    """Returns the absolute path to the data directory"""
-    return os.path.join(get_project_root(), "data", "TPI ASCOR data - 13012025")
+    """
+    Returns the absolute path to the data directory
+
+    The ASCOR_DATA_PATH environment variable takes precedence; otherwise this
+    is the most recent 'TPI ASCOR data - <ddmmyyyy>' release under data/.
+    """
+    override = os.getenv("ASCOR_DATA_PATH")
+    if override:
+        return os.path.abspath(override)
+
+    data_root = os.path.join(get_project_root(), "data")
+    releases = [
+        folder for folder in os.listdir(data_root)
+        if folder.startswith(DATA_RELEASE_PREFIX) and os.path.isdir(os.path.join(data_root, folder))
+    ]
+    if not releases:
+        return os.path.join(data_root, "TPI ASCOR data - 13012025")
+    return os.path.join(data_root, max(releases, key=lambda folder: (_release_date(folder), folder)))
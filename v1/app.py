@@ -1,10 +1,10 @@
 import os
-import pandas as pd
 
 from fastapi import FastAPI, HTTPException
-df_assessments = pd.read_excel("./data/TPI ASCOR data - 13012025/ASCOR_assessments_results.xlsx")
-df_assessments['Assessment date'] = pd.to_datetime(df_assessments['Assessment date'])
-df_assessments['Publication date'] = pd.to_datetime(df_assessments['Publication date'])
+from common.datastore import get_dataset
+from common.responses import FastJSONResponse
+from common.metrics import timed
+from common.offload import run_blocking
 
 def __is_running_on_nuvolos():
     """
@@ -20,10 +20,10 @@ if __is_running_on_nuvolos():
     # Nuvolos alters the URL of the API (likely for security reasons)
     # Instead of https://A-BIG-IP-ADDRESS:8000/
     # The API is actually served at https://A-BIG-IP-ADDRESS/proxy/8000/
-    app = FastAPI(root_path="/proxy/8000/")
+    app = FastAPI(root_path="/proxy/8000/", default_response_class=FastJSONResponse)
 else:
     # No need to set up anything else if running this on local machine
-    app = FastAPI()
+    app = FastAPI(default_response_class=FastJSONResponse)
 
 @app.get("/")
 async def read_root():
@@ -44,34 +44,36 @@ async def get_country_data(country: str, assessment_year: int):
             detail="Both country and year must be provided"
         )
 
+    # The pandas work runs on the work pool so it doesn't hold the event loop
+    return await run_blocking(_country_data, country, assessment_year)
+
+def _country_data(country: str, assessment_year: int):
     try:
+        dataset = get_dataset()
+        assessments_index = dataset.assessments_index
+
+        # Accept any spelling the resolver knows (case, accents, ISO code)
+        name = dataset.resolve_country(country) or country
+
         # Check if country exists first
-        if country not in df_assessments['Country'].unique():
+        if name not in assessments_index.countries:
             raise HTTPException(
                 status_code=404,
                 detail=f"Country '{country}' not found in dataset"
             )
-        
-        # Check if year exists for this country
-        country_years = df_assessments[df_assessments['Country'] == country]['Assessment date'].dt.year.unique()
-        if assessment_year not in country_years:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No data found for country '{country}' in year {assessment_year}"
-            )
 
-        # Filter the data
-        mask = (df_assessments['Country'] == country) & (df_assessments['Assessment date'].dt.year == assessment_year)
-        data = df_assessments[mask]
+        # Look up the rows for this country and year
+        with timed("v1", "lookup"):
+            data = assessments_index.get(name, assessment_year)
 
-        if data.empty:
+        if data is None or data.empty:
             raise HTTPException(
                 status_code=404,
                 detail=f"No data found for country '{country}' in year {assessment_year}"
             )
 
         # Get area columns
-        area_columns = [col for col in df_assessments.columns if col.startswith('area')]
+        area_columns = [col for col in data.columns if col.startswith('area')]
         if not area_columns:
             raise HTTPException(
                 status_code=500,
@@ -87,14 +89,15 @@ async def get_country_data(country: str, assessment_year: int):
             )
 
         # Add metadata and clean up
-        result['country'] = country
+        result['country'] = name
         result['assessment_year'] = assessment_year
         result = result.fillna('')
         result.rename(columns=lambda x: x.replace('area ', ''), inplace=True)
 
         # Get first row safely
         if len(result) > 0:
-            return result.iloc[0].to_dict()
+            # Returned as a response so the row is encoded here, on the work pool
+            return FastJSONResponse(result.iloc[0].to_dict())
         else:
             raise HTTPException(
                 status_code=404,
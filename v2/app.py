@@ -1,26 +1,25 @@
 import os
-import pandas as pd
 from typing import List
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from .models import ResponseData, ErrorResponse
-from .transformers import transform_country_data
+from .state import get_state
 from .exceptions import DataNotFoundError, ASCORException
-from utils import get_data_path  # Changed from relative to absolute import
+from common.datastore import get_dataset
+from common.metrics import timed
+from common.offload import ServiceOverloaded, run_blocking
+from common.response_cache import cached_response
+from common.responses import FastJSONResponse
 
-app = FastAPI()
-
-df_assessments = pd.read_excel(os.path.join(get_data_path(), "ASCOR_assessments_results.xlsx"))
-df_assessments['Assessment date'] = pd.to_datetime(df_assessments['Assessment date'])
-df_assessments['Publication date'] = pd.to_datetime(df_assessments['Publication date'])
+app = FastAPI(default_response_class=FastJSONResponse)
 
 def __is_running_on_nuvolos():
     hostname = os.getenv("HOSTNAME")
     return hostname is not None and hostname.startswith('nv-')
 
 if __is_running_on_nuvolos():
-    app = FastAPI(root_path="/proxy/8000/v2")
+    app = FastAPI(root_path="/proxy/8000/v2", default_response_class=FastJSONResponse)
 else:
-    app = FastAPI()
+    app = FastAPI(default_response_class=FastJSONResponse)
 
 @app.get("/")
 async def read_root():
@@ -29,21 +28,22 @@ async def read_root():
 @app.get("/country-data/{country}/{assessment_year}")
 async def get_country_data(country: str, assessment_year: int):
     """Legacy endpoint for compatibility with v1"""
-    try:
-        selected_row = (
-            (df_assessments["Country"] == country) &
-            (df_assessments['Assessment date'].dt.year == assessment_year)
-        )
+    return await run_blocking(_country_data, country, assessment_year)
 
-        data = df_assessments[selected_row]
+def _country_data(country: str, assessment_year: int):
+    try:
+        with timed("v2", "lookup"):
+            dataset = get_dataset()
+            name = dataset.resolve_country(country) or country
+            data = dataset.assessments_index.get(name, assessment_year)
 
-        if data.empty:
+        if data is None:
             raise DataNotFoundError(
                 message=f"No data found for country: {country} and year: {assessment_year}"
             )
 
         output_dict = {
-            "country": country,
+            "country": name,
             "assessment_year": assessment_year
         }
 
@@ -53,7 +53,9 @@ async def get_country_data(country: str, assessment_year: int):
             key = col.replace('area ', '').replace('.', '_')
             output_dict[key] = data[col].iloc[0]
 
-        return output_dict
+        # The cells are NumPy/pandas values; returning the response skips
+        # jsonable_encoder and encodes them on the work pool
+        return FastJSONResponse(output_dict)
 
     except DataNotFoundError as e:
         raise e
@@ -65,32 +67,22 @@ async def get_country_data(country: str, assessment_year: int):
     response_model=ResponseData,
     responses={404: {"model": ErrorResponse}}
 )
-async def get_country_metrics(country: str, assessment_year: int):
+async def get_country_metrics(country: str, assessment_year: int, request: Request):
     try:
-        selected_row = (
-            (df_assessments["Country"] == country) &
-            (df_assessments['Assessment date'].dt.year == assessment_year)
+        state = get_state()
+        name = get_dataset().resolve_country(country) or country
+        entry = await state.render_flights.fill(
+            state.cached_country_metrics(name, assessment_year),
+            (name, assessment_year), state.render_country_metrics, name, assessment_year
         )
 
-        data = df_assessments[selected_row]
-
-        if data.empty:
+        if entry is None:
             raise DataNotFoundError(
                 message=f"No data found for country: {country} and year: {assessment_year}"
             )
 
-        raw_data = {
-            "country": country,
-            "assessment_year": assessment_year
-        }
-
-        # Add data preserving original column names
-        for col in data.columns:
-            if col.startswith(("area", "indicator", "metric")):
-                raw_data[col] = data[col].iloc[0]
-
-        return transform_country_data(raw_data)
-    except DataNotFoundError as e:
+        return await cached_response(request, entry)
+    except (DataNotFoundError, ServiceOverloaded) as e:
         raise e
     except Exception as e:
         raise ASCORException(status_code=500, message=str(e))
@@ -0,0 +1,55 @@
+from typing import Optional, Sequence
+from .transformers import TransformPlan
+from common.datastore import Dataset, get_dataset, register_builder
+from common.metrics import timed
+from common.offload import SingleFlight
+from common.response_cache import CachedResponse, ResponseCache
+
+class V2State:
+    """Everything v2 derives from one data release."""
+
+    def __init__(self, dataset: Dataset):
+        # The tree layout, compiled from the indicator definitions and the
+        # assessment headers, so a release with new areas or indicators is
+        # served without code changes
+        schema = zip(dataset.indicators['Type'], dataset.indicators['Code'])
+        self.plan = TransformPlan.compile(dataset.assessments.columns, schema)
+
+        # Only the columns the plan reads, as plain rows, and the first row
+        # of every (country, year)
+        columns = dataset.assessments[self.plan.columns]
+        self._rows = columns.astype(object).where(columns.notna(), None).to_numpy()
+        self._positions = {key: positions[0] for key, positions in dataset.assessments_index.positions().items()}
+
+        # Rendered /country-metrics bodies, filled on first request; concurrent
+        # misses for the same body share one render
+        self.metrics_cache = ResponseCache("v2_country_metrics")
+        self.render_flights = SingleFlight("v2_country_metrics")
+
+    def row(self, country: str, assessment_year: int) -> Optional[Sequence]:
+        """The plan's row for one country and year, or None if there is none"""
+        position = self._positions.get((country, assessment_year))
+        return None if position is None else self._rows[position]
+
+    def cached_country_metrics(self, country: str, assessment_year: int) -> Optional[CachedResponse]:
+        """The rendered /country-metrics body if it is already cached"""
+        with timed("v2", "lookup"):
+            return self.metrics_cache.get((country, assessment_year))
+
+    def render_country_metrics(self, country: str, assessment_year: int) -> Optional[CachedResponse]:
+        """Build, render and cache the /country-metrics body, or None if there is no data"""
+        with timed("v2", "lookup"):
+            row = self.row(country, assessment_year)
+        if row is None:
+            return None
+        with timed("v2", "transform"):
+            response = self.plan.build(row, country, assessment_year)
+        with timed("v2", "serialize"):
+            body = response.model_dump_json().encode()
+        return self.metrics_cache.put((country, assessment_year), body)
+
+register_builder("v2", V2State)
+
+def get_state() -> V2State:
+    """The v2 state of the release currently being served"""
+    return get_dataset().derived["v2"]
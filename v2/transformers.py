@@ -1,69 +1,159 @@
-from typing import Dict, Any, List
+"""
+Builds the v2 /country-metrics tree from one assessment row.
+
+The pillar/area/indicator/metric hierarchy is not hard-coded: it is compiled
+once per data release from the indicator definitions and the assessment
+column headers into a :class:`TransformPlan`, which fills the tree from a
+row by position.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 import pandas as pd
-from .models import ResponseData, Metadata, Pillar, Area, Indicator, Metric
+from .models import ResponseData
+
+# Assessment column headers are "<type> <code>", e.g. "indicator EP.1.a"
+HEADER_TYPES = ('area', 'indicator', 'metric')
+
+
+class IndicatorNode(NamedTuple):
+    name: str
+    column: int
+    metric: Optional[str]
+    metric_column: Optional[int]
+
+
+class AreaNode(NamedTuple):
+    name: str
+    column: int
+    indicators: Tuple[IndicatorNode, ...]
+
+
+class PillarNode(NamedTuple):
+    name: str
+    areas: Tuple[AreaNode, ...]
+
+
+def _parent(code: str) -> str:
+    return code.rpartition('.')[0]
+
+
+class TransformPlan:
+    """
+    The tree every assessment row is rendered into, with the position of
+    each node's value in the row.
+
+    ``columns`` are the assessment columns the plan reads, in the order of
+    the row it expects; a row is any sequence of their values, with None
+    for the missing ones.
+    """
+
+    def __init__(self, pillars: Sequence[PillarNode], columns: Sequence[str]):
+        self.pillars = tuple(pillars)
+        self.columns = list(columns)
+
+    @classmethod
+    def compile(
+        cls,
+        headers: Iterable[str],
+        schema: Iterable[Tuple[str, str]] = ()
+    ) -> 'TransformPlan':
+        """
+        Compile the plan for a set of assessment column headers.
+
+        ``schema`` is the (type, code) of every node of the indicator
+        definitions, in their order; nodes only found in the headers are
+        added after their siblings, so a release adding an area or
+        indicator needs no code change. A node without a column is skipped.
+        Each indicator reports its first metric, the single one the v2
+        model holds.
+        """
+        positions: Dict[Tuple[str, str], str] = {}
+        for header in headers:
+            kind, _, code = str(header).partition(' ')
+            if kind in HEADER_TYPES and code and ' ' not in code:
+                positions.setdefault((kind, code), header)
+
+        nodes = list(dict.fromkeys([*schema, *positions]))
+        children: Dict[str, List[Tuple[str, str]]] = {}
+        pillars: List[str] = []
+        for kind, code in nodes:
+            if kind == 'pillar':
+                pillars.append(code)
+            else:
+                children.setdefault(_parent(code), []).append((kind, code))
+                if kind == 'area' and _parent(code) not in pillars:
+                    pillars.append(_parent(code))
+
+        columns: List[str] = []
+
+        def column(kind: str, code: str) -> int:
+            columns.append(positions[(kind, code)])
+            return len(columns) - 1
+
+        def present(parent: str, kind: str) -> List[str]:
+            return [code for k, code in children.get(parent, []) if k == kind and (k, code) in positions]
+
+        plan = []
+        for pillar in pillars:
+            areas = []
+            for area in present(pillar, 'area'):
+                indicators = []
+                for indicator in present(area, 'indicator'):
+                    metrics = present(indicator, 'metric')
+                    indicators.append(IndicatorNode(
+                        name=indicator,
+                        column=column('indicator', indicator),
+                        metric=metrics[0] if metrics else None,
+                        metric_column=column('metric', metrics[0]) if metrics else None,
+                    ))
+                areas.append(AreaNode(area, column('area', area), tuple(indicators)))
+            if areas:
+                plan.append(PillarNode(pillar, tuple(areas)))
+        return cls(plan, columns)
+
+    def build(self, row: Sequence[Any], country: str, assessment_year: int) -> ResponseData:
+        """Fill the tree from ``row``, the values of :attr:`columns`"""
+        pillars = []
+        for pillar in self.pillars:
+            areas = []
+            for area in pillar.areas:
+                assessment = row[area.column]
+                # An area is reported only when it has been assessed
+                if not assessment:
+                    continue
+                indicators = []
+                for node in area.indicators:
+                    metric = None
+                    if node.metric_column is not None:
+                        value = row[node.metric_column]
+                        if value is not None:
+                            metric = {'name': node.metric, 'value': str(value)}
+                    indicators.append({'name': node.name, 'assessment': row[node.column], 'metrics': metric})
+                areas.append({'name': area.name, 'assessment': assessment, 'indicators': indicators})
+            if areas:
+                pillars.append({'name': pillar.name, 'areas': areas})
+
+        # Validated as one document rather than one model at a time
+        return ResponseData.model_validate({
+            'metadata': {'country': country, 'assessment_year': assessment_year},
+            'pillars': pillars,
+        })
+
+
+@lru_cache(maxsize=32)
+def _header_plan(headers: Tuple[str, ...]) -> TransformPlan:
+    return TransformPlan.compile(headers)
+
 
 def transform_country_data(raw_data: Dict[str, Any]) -> ResponseData:
-    metadata = Metadata(
-        country=raw_data['country'],
-        assessment_year=raw_data['assessment_year']
-    )
-    
-    pillars = []
-    
-    def process_pillar(pillar_code: str, max_areas: int) -> List[Area]:
-        areas = []
-        for i in range(1, max_areas + 1):
-            area_key = f"area {pillar_code}.{i}"
-            if area_key in raw_data and raw_data[area_key]:
-                area = Area(
-                    name=f"{pillar_code}.{i}",
-                    assessment=raw_data[area_key],
-                    indicators=[]
-                )
-                
-                # Add indicators for this area
-                for indicator_key in raw_data:
-                    if indicator_key.startswith(f"indicator {pillar_code}.{i}."):
-                        # Extract the indicator suffix (a, b, c, etc.)
-                        ind_suffix = indicator_key.split('.')[-1]
-                        ind_name = f"{pillar_code}.{i}.{ind_suffix}"
-                        
-                        indicator = Indicator(
-                            name=ind_name,
-                            assessment=raw_data[indicator_key],
-                            metrics=None
-                        )
-
-                        # Look for corresponding metrics
-                        metric_key = f"metric {pillar_code}.{i}.{ind_suffix}.i"
-                        if metric_key in raw_data and pd.notna(raw_data[metric_key]):
-                            indicator.metrics = Metric(
-                                name=f"{pillar_code}.{i}.{ind_suffix}.i",
-                                value=str(raw_data[metric_key])
-                            )
-                        
-                        area.indicators.append(indicator)
-                
-                if area.indicators or area.assessment:
-                    areas.append(area)
-        return areas
-
-    # Process EP Pillar (3 areas)
-    ep_areas = process_pillar("EP", 3)
-    if ep_areas:
-        pillars.append(Pillar(name="EP", areas=ep_areas))
-
-    # Process CP Pillar (6 areas)
-    cp_areas = process_pillar("CP", 6)
-    if cp_areas:
-        pillars.append(Pillar(name="CP", areas=cp_areas))
-
-    # Process CF Pillar (4 areas)
-    cf_areas = process_pillar("CF", 4)
-    if cf_areas:
-        pillars.append(Pillar(name="CF", areas=cf_areas))
-
-    return ResponseData(
-        metadata=metadata,
-        pillars=pillars
+    """
+    Build the tree from a dict of assessment columns plus ``country`` and
+    ``assessment_year``, compiling (once per set of columns) a plan from
+    the headers alone.
+    """
+    plan = _header_plan(tuple(raw_data))
+    return plan.build(
+        [None if pd.isna(raw_data[column]) else raw_data[column] for column in plan.columns],
+        raw_data['country'],
+        raw_data['assessment_year']
     )
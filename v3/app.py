@@ -1,49 +1,435 @@
 import os
-import pandas as pd
-from fastapi import FastAPI
-from .models import ResponseData, ErrorResponse
-from .transformers import transform_country_data, melt_assessment_data
-from .exceptions import DataNotFoundError, ASCORException
-from utils import get_data_path
-
-# Load and transform data
-df_assessments = pd.read_excel(os.path.join(get_data_path(), "ASCOR_assessments_results.xlsx"))
-df_assessments['Assessment date'] = pd.to_datetime(df_assessments['Assessment date'])
-df_assessments['Publication date'] = pd.to_datetime(df_assessments['Publication date'])
-melted_df = melt_assessment_data(df_assessments)
+import json
+from typing import List, Optional
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from .models import (
+    ResponseData, ErrorResponse, BatchRequest, BatchResponse,
+    CountryInfo, CountrySuggestion, IndicatorInfo, TrendSeries, BenchmarkSeries, QueryResponse, DiffResponse
+)
+from .formats import FORMAT_MEDIA_TYPES, available_formats, negotiate_format
+from .export import MEDIA_TYPES, STREAMERS, arrow_available, select_rows
+from .query import CELL_TYPES, QUERY_FIELDS, RANK_BY
+from .exceptions import DataNotFoundError, DataValidationError, ASCORException
+from .state import get_state
+from .transformers import DEPTHS, PILLAR_CODES, TreeView, diff_country_data
+from common.datastore import get_dataset
+from common.metrics import timed
+from common.offload import ServiceOverloaded, iterate_blocking, run_blocking
+from common.response_cache import cached_response
+from common.responses import FastJSONResponse
+
+MAX_BATCH_ITEMS = 500
 
 def __is_running_on_nuvolos():
     hostname = os.getenv("HOSTNAME")
     return hostname is not None and hostname.startswith('nv-')
 
 if __is_running_on_nuvolos():
-    app = FastAPI(root_path="/proxy/8000/v3")
+    app = FastAPI(root_path="/proxy/8000/v3", default_response_class=FastJSONResponse)
 else:
-    app = FastAPI()
+    app = FastAPI(default_response_class=FastJSONResponse)
 
 @app.get("/")
 async def read_root():
     return {"version": "v3"}
 
+# Declared before /country-metrics/{country}/{assessment_year}, which would
+# otherwise match "diff" as the year
+@app.get(
+    "/country-metrics/{country}/diff",
+    response_model=DiffResponse,
+    responses={404: {"model": ErrorResponse}}
+)
+async def get_country_metrics_diff(
+    country: str,
+    from_year: int = Query(..., alias="from", description="Assessment year to compare from"),
+    to_year: int = Query(..., alias="to", description="Assessment year to compare to")
+):
+    """
+    The areas, indicators and metrics of a country whose assessment changed
+    between two assessment years, with their values in both years.
+    """
+    try:
+        state = get_state()
+        name = get_dataset().resolve_country(country) or country
+        with timed("v3", "lookup"):
+            before = state.melted_index.get(name, from_year)
+            after = state.melted_index.get(name, to_year)
+
+        for year, data in ((from_year, before), (to_year, after)):
+            if data is None:
+                raise DataNotFoundError(message=f"No data found for country: {country} and year: {year}")
+
+        def diff():
+            with timed("v3", "transform"):
+                return diff_country_data(before, after)
+
+        changes = await run_blocking(diff)
+        return DiffResponse(country=name, from_year=from_year, to_year=to_year, changes=changes)
+    except (DataNotFoundError, ServiceOverloaded) as e:
+        raise e
+    except Exception as e:
+        raise ASCORException(status_code=500, message=str(e))
+
+def _tree_view(pillars: Optional[str], depth: str, include_sources: bool) -> TreeView:
+    selected = PILLAR_CODES
+    if pillars is not None:
+        requested = {pillar.strip().upper() for pillar in pillars.split(",") if pillar.strip()}
+        unknown = requested - set(PILLAR_CODES)
+        if unknown or not requested:
+            raise DataValidationError(
+                message=f"Unsupported pillars: {pillars}",
+                details={"supported": PILLAR_CODES}
+            )
+        selected = [pillar for pillar in PILLAR_CODES if pillar in requested]
+    if depth not in DEPTHS:
+        raise DataValidationError(message=f"Unsupported depth: {depth}", details={"supported": list(DEPTHS)})
+    return TreeView(tuple(selected), depth, include_sources)
+
 @app.get(
     "/country-metrics/{country}/{assessment_year}",
     response_model=ResponseData,
-    responses={404: {"model": ErrorResponse}}
+    responses={
+        200: {"content": {media_type: {} for media_type in FORMAT_MEDIA_TYPES.values()}},
+        404: {"model": ErrorResponse},
+        406: {"model": ErrorResponse},
+        422: {"model": ErrorResponse}
+    }
 )
-async def get_country_metrics(country: str, assessment_year: int):
+async def get_country_metrics(
+    country: str,
+    assessment_year: int,
+    request: Request,
+    format: Optional[str] = Query(None, description="json, msgpack, ndjson or columnar; overrides the Accept header"),
+    pillars: Optional[str] = Query(None, description="Comma-separated pillars to include, e.g. CP,CF"),
+    depth: str = Query("metric", description="Deepest level to include: area, indicator or metric"),
+    include_sources: bool = Query(True, description="Include indicator sources")
+):
+    """
+    The Pillar/Area/Indicator/Metric tree of a country and assessment year.
+
+    Besides JSON, the same data can be requested as MessagePack
+    (``application/msgpack``), one row per area, indicator and metric
+    (``application/x-ndjson``) or as those rows in parallel arrays
+    (``application/vnd.ascor.columnar+json``), through the ``Accept``
+    header or ``format``. Bodies are compressed with brotli or gzip when
+    the client accepts it.
+
+    ``pillars``, ``depth`` and ``include_sources`` return part of the tree;
+    only the rows it needs are looked up and transformed.
+    """
+    view = _tree_view(pillars, depth, include_sources)
+    fmt = format if format is not None else negotiate_format(request.headers.get("accept"))
+    if fmt not in available_formats():
+        raise ASCORException(
+            status_code=406,
+            message=f"Unsupported format: {format or request.headers.get('accept')}",
+            details={"supported": {name: FORMAT_MEDIA_TYPES[name] for name in available_formats()}}
+        )
+
     try:
-        filtered_data = melted_df[
-            (melted_df["Country"] == country) &
-            (melted_df['Assessment date'].dt.year == assessment_year)
-        ]
+        state = get_state()
+        name = get_dataset().resolve_country(country) or country
+        entry = await state.render_flights.fill(
+            state.cached_country_metrics(name, assessment_year, fmt, view),
+            state.metrics_key(name, assessment_year, fmt, view),
+            state.render_country_metrics, name, assessment_year, fmt, view
+        )
 
-        if filtered_data.empty:
+        if entry is None:
             raise DataNotFoundError(
                 message=f"No data found for country: {country} and year: {assessment_year}"
             )
 
-        return transform_country_data(filtered_data, country, assessment_year)
-    except DataNotFoundError as e:
+        return await cached_response(request, entry, vary=("Accept", "Accept-Encoding"))
+    except (DataNotFoundError, ServiceOverloaded) as e:
+        raise e
+    except Exception as e:
+        raise ASCORException(status_code=500, message=str(e))
+
+@app.post(
+    "/country-metrics/batch",
+    response_model=BatchResponse,
+    responses={422: {"model": ErrorResponse}}
+)
+async def get_country_metrics_batch(batch: BatchRequest):
+    """
+    Fetch the metrics of many countries and years in one request.
+
+    Each item names a country and an assessment year; use ``"*"`` as the
+    country or leave out the year to match all of them. Items that match
+    nothing are reported as ``not_found`` instead of failing the request.
+    """
+    if len(batch.items) > MAX_BATCH_ITEMS:
+        raise DataValidationError(
+            message=f"A batch can contain at most {MAX_BATCH_ITEMS} items",
+            details={"items": len(batch.items)}
+        )
+
+    try:
+        # The cached bodies are already serialized, so the combined payload is
+        # assembled from bytes rather than re-validated through BatchResponse
+        state = get_state()
+        dataset = get_dataset()
+        plan = []
+        for item in batch.items:
+            if item.country == "*":
+                countries = sorted(state.melted_index.countries)
+            else:
+                countries = [dataset.resolve_country(item.country) or item.country]
+            keys = []
+            for country in countries:
+                if item.assessment_year is None:
+                    keys.extend((country, year) for year in state.melted_index.years(country))
+                else:
+                    keys.append((country, item.assessment_year))
+            plan.append((item, keys))
+
+        # Hits are served from the event loop; the misses are rendered
+        # together in a single pool task rather than one round trip each
+        entries = {}
+        for _, keys in plan:
+            for key in keys:
+                if key not in entries:
+                    entries[key] = state.cached_country_metrics(*key)
+        misses = [key for key, entry in entries.items() if entry is None]
+        if misses:
+            entries.update(zip(misses, await run_blocking(state.country_metrics_entries, misses)))
+
+        results = []
+        for item, keys in plan:
+            matched = False
+            for country, year in keys:
+                entry = entries[country, year]
+                if entry is not None:
+                    matched = True
+                    header = json.dumps({"country": country, "assessment_year": year, "status": "ok"})
+                    results.append(header[:-1].encode() + b', "data": ' + entry.body + b"}")
+
+            if not matched:
+                results.append(json.dumps({
+                    "country": item.country,
+                    "assessment_year": item.assessment_year,
+                    "status": "not_found",
+                    "message": f"No data found for country: {item.country} and year: {item.assessment_year}"
+                }).encode())
+
+        return Response(
+            content=b'{"results": [' + b", ".join(results) + b"]}",
+            media_type="application/json"
+        )
+    except ServiceOverloaded as e:
+        raise e
+    except Exception as e:
+        raise ASCORException(status_code=500, message=str(e))
+
+@app.get(
+    "/export",
+    responses={
+        200: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}},
+        422: {"model": ErrorResponse}
+    }
+)
+async def export_assessments(
+    format: str = "ndjson",
+    pillar: Optional[str] = None,
+    country: Optional[str] = None,
+    year: Optional[int] = None
+):
+    """
+    Stream the long-format assessment table, optionally filtered.
+
+    ``format`` is one of ``ndjson``, ``csv`` or ``arrow`` (Arrow IPC stream).
+    Rows are serialized in chunks on the work pool as they are sent, so
+    the full body is never held in memory.
+    """
+    if format not in STREAMERS:
+        raise DataValidationError(
+            message=f"Unsupported export format: {format}",
+            details={"supported": list(STREAMERS)}
+        )
+    if format == "arrow" and not arrow_available():
+        raise ASCORException(status_code=501, message="Arrow export requires pyarrow to be installed")
+
+    state = get_state()
+    if country is not None:
+        country = get_dataset().resolve_country(country) or country
+    positions = select_rows(state.melted_df, pillar=pillar, country=country, year=year)
+    filename = "ascor_assessments." + ("arrows" if format == "arrow" else format)
+
+    return StreamingResponse(
+        await iterate_blocking(STREAMERS[format](state.melted_df, positions)),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get(
+    "/query",
+    response_model=QueryResponse,
+    responses={422: {"model": ErrorResponse}}
+)
+async def query_assessments(
+    code: Optional[List[str]] = Query(None, description="Pillar, area, indicator or metric code; matches everything below it"),
+    type: Optional[List[str]] = Query(None, description="area, indicator or metric"),
+    value: Optional[List[str]] = Query(None, description="Assessment value, e.g. Yes"),
+    year: Optional[List[int]] = Query(None, description="Assessment year"),
+    country: Optional[List[str]] = Query(None, description="Country name or ISO code"),
+    group_by: Optional[List[str]] = Query(None, description="Count matches per country, year, type, pillar, code and/or value"),
+    rank_by: str = Query("matches", description="Rank countries by matches or share"),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many ranked countries")
+):
+    """
+    Count, group and rank assessments across countries.
+
+    For example ``?code=CP.3&type=area&value=Yes&year=2024`` lists the
+    countries assessed "Yes" on CP.3 in 2024, and
+    ``?code=EP&type=area&group_by=year&group_by=value`` gives the
+    distribution of EP area assessments by year. Repeat a parameter to match
+    any of several values. ``assessed`` counts the cells matching every
+    filter except ``value``, and ``share`` is ``matches / assessed``.
+    """
+    unsupported = [field for field in group_by or [] if field not in QUERY_FIELDS]
+    if unsupported:
+        raise DataValidationError(
+            message=f"Unsupported group_by field: {', '.join(unsupported)}",
+            details={"supported": QUERY_FIELDS}
+        )
+    unsupported = [cell_type for cell_type in type or [] if cell_type not in CELL_TYPES]
+    if unsupported:
+        raise DataValidationError(
+            message=f"Unsupported type: {', '.join(unsupported)}",
+            details={"supported": CELL_TYPES}
+        )
+    if rank_by not in RANK_BY:
+        raise DataValidationError(message=f"Unsupported rank_by: {rank_by}", details={"supported": RANK_BY})
+
+    dataset = get_dataset()
+    countries = [dataset.resolve_country(name) or name for name in country or []]
+
+    def query():
+        with timed("v3", "query"):
+            return dataset.derived["v3"].query_table.query(
+                codes=code, types=type, values=value, years=year, countries=countries,
+                group_by=group_by, rank_by=rank_by, limit=limit
+            )
+
+    try:
+        return await run_blocking(query)
+    except ServiceOverloaded as e:
         raise e
     except Exception as e:
         raise ASCORException(status_code=500, message=str(e))
+
+def _resolve_country(country: str) -> str:
+    name = get_dataset().resolve_country(country)
+    if name is None:
+        raise DataNotFoundError(message=f"Country not found: {country}")
+    return name
+
+@app.get("/countries", response_model=List[CountryInfo])
+async def list_countries():
+    return list(get_state().country_info.values())
+
+# Declared before /countries/{country}, which would otherwise match "suggest"
+@app.get("/countries/suggest", response_model=List[CountrySuggestion])
+async def suggest_countries(
+    q: str = Query(..., min_length=1, description="Start of a country's name, of a later word in it or of its ISO code"),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Countries for autocomplete, best first: names starting with ``q``, then
+    ISO codes, then names with a later word starting with it. Case and
+    accents are ignored.
+    """
+    resolver = get_dataset().country_resolver
+    # Built directly; the suggestions are plain strings from the resolver
+    return FastJSONResponse([
+        {"name": name, "iso_code": resolver.iso_codes[name]} for name in resolver.suggest(q, limit)
+    ])
+
+@app.get(
+    "/countries/{country}",
+    response_model=CountryInfo,
+    responses={404: {"model": ErrorResponse}}
+)
+async def get_country(country: str):
+    """Metadata for a country, looked up by name or ISO code"""
+    name = _resolve_country(country)
+    info = get_state().country_info.get(name)
+    if info is None:
+        raise DataNotFoundError(message=f"No metadata found for country: {country}")
+    return info
+
+@app.get(
+    "/trends/{country}",
+    response_model=List[TrendSeries],
+    responses={404: {"model": ErrorResponse}, 422: {"model": ErrorResponse}}
+)
+async def get_trends(
+    country: str,
+    assessment_year: Optional[int] = None,
+    from_year: Optional[int] = None,
+    to_year: Optional[int] = None,
+    step: Optional[int] = Query(None, ge=1, description="Keep one point per N-year bucket"),
+    agg: str = Query("first", description="How a bucket is reduced: first or mean"),
+    max_points: Optional[int] = Query(None, ge=2, description="Reduce each series to at most this many points (LTTB)")
+):
+    """
+    Emissions trend and pathway series for a country, by name or ISO code.
+
+    Each series is returned as parallel ``years``/``values`` arrays. They can
+    be limited to a year range and downsampled on the server, either into
+    fixed ``step``-year buckets or to ``max_points`` shape-preserving points.
+    """
+    if agg not in ("first", "mean"):
+        raise DataValidationError(message=f"Unsupported aggregation: {agg}", details={"supported": ["first", "mean"]})
+    if from_year is not None and to_year is not None and from_year > to_year:
+        raise DataValidationError(message="from_year must not be after to_year")
+
+    name = _resolve_country(country)
+    matrix = get_state().trends.get(name)
+    if matrix is None:
+        raise DataNotFoundError(message=f"No emissions trends found for country: {country}")
+
+    rows = None
+    if assessment_year is not None:
+        rows = [
+            i for i, series in enumerate(matrix.models)
+            if series.assessment_date and series.assessment_date.year == assessment_year
+        ]
+        if not rows:
+            raise DataNotFoundError(
+                message=f"No emissions trends found for country: {country} and year: {assessment_year}"
+            )
+
+    return matrix.select(rows, from_year, to_year, step, agg, max_points)
+
+@app.get(
+    "/benchmarks/{country}",
+    response_model=List[BenchmarkSeries],
+    responses={404: {"model": ErrorResponse}}
+)
+async def get_benchmarks(country: str):
+    """Emissions benchmark series for a country, by name or ISO code"""
+    name = _resolve_country(country)
+    series = get_state().benchmarks.get(name)
+    if not series:
+        raise DataNotFoundError(message=f"No benchmarks found for country: {country}")
+    return series
+
+@app.get("/indicators", response_model=List[IndicatorInfo])
+async def list_indicators():
+    return list(get_state().indicator_info.values())
+
+@app.get(
+    "/indicators/{code}",
+    response_model=IndicatorInfo,
+    responses={404: {"model": ErrorResponse}}
+)
+async def get_indicator(code: str):
+    """Definition of a pillar, area, indicator or metric by its code (e.g. CP.3.a)"""
+    info = get_state().indicator_info.get(code)
+    if info is None:
+        raise DataNotFoundError(message=f"Indicator not found: {code}")
+    return info
@@ -0,0 +1,110 @@
+"""Chunked serializers for streaming the melted assessment table."""
+import io
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+EXPORT_COLUMNS = [
+    'Country', 'Assessment date', 'Publication date', 'metric_path',
+    'type', 'code', 'pillar', 'area', 'indicator', 'metric', 'value', 'source'
+]
+DATE_COLUMNS = ['Assessment date', 'Publication date']
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+CHUNK_ROWS = 2000
+
+
+def _decode(series: pd.Series) -> pd.Series:
+    """Categorical codes back to their text, missing values as None"""
+    return series.astype(object).where(series.notna(), None)
+
+
+def _prepare_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = chunk[EXPORT_COLUMNS].copy()
+    for col in chunk.columns:
+        if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+            chunk[col] = _decode(chunk[col])
+    return chunk
+
+
+def iter_chunks(
+    df: pd.DataFrame,
+    positions: np.ndarray,
+    chunk_rows: int = CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the selected rows ``chunk_rows`` at a time.
+
+    Only the row positions are held for the whole export, so memory stays
+    bounded by the chunk size rather than the size of the selection.
+    """
+    for start in range(0, len(positions), chunk_rows):
+        yield _prepare_chunk(df.iloc[positions[start:start + chunk_rows]])
+
+
+def stream_ndjson(df: pd.DataFrame, positions: np.ndarray) -> Iterator[bytes]:
+    for chunk in iter_chunks(df, positions):
+        # Every line, the last one included, already ends with a newline
+        yield chunk.to_json(orient='records', lines=True, date_format='iso').encode()
+
+
+def stream_csv(df: pd.DataFrame, positions: np.ndarray) -> Iterator[bytes]:
+    header = True
+    for chunk in iter_chunks(df, positions):
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+    if header:
+        yield (','.join(EXPORT_COLUMNS) + '\n').encode()
+
+
+def stream_arrow(df: pd.DataFrame, positions: np.ndarray) -> Iterator[bytes]:
+    """Arrow IPC stream, one record batch per chunk"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        (col, pa.timestamp('ns') if col in DATE_COLUMNS else pa.string()) for col in EXPORT_COLUMNS
+    ])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in iter_chunks(df, positions):
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+STREAMERS = {
+    'ndjson': stream_ndjson,
+    'csv': stream_csv,
+    'arrow': stream_arrow,
+}
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def select_rows(
+    df: pd.DataFrame,
+    pillar: Optional[str] = None,
+    country: Optional[str] = None,
+    year: Optional[int] = None
+) -> np.ndarray:
+    """Positions of the melted rows matching the given filters"""
+    mask = pd.Series(True, index=df.index)
+    if pillar is not None:
+        mask &= df['pillar'] == pillar
+    if country is not None:
+        mask &= df['Country'] == country
+    if year is not None:
+        mask &= df['Assessment date'].dt.year == year
+    return np.flatnonzero(mask.to_numpy())
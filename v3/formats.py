@@ -0,0 +1,110 @@
+"""Alternative encodings of the /country-metrics tree, chosen by content negotiation."""
+from typing import Any, Callable, Dict, List, Optional
+
+from common.responses import dumps
+
+FORMAT_MEDIA_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'ndjson': 'application/x-ndjson',
+    'columnar': 'application/vnd.ascor.columnar+json',
+}
+ROW_FIELDS = ['type', 'name', 'value', 'source']
+
+
+def flatten(tree: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The tree as one row per area, indicator and metric, in tree order.
+
+    An area or indicator's ``value`` is its assessment; only indicators
+    have a ``source``.
+    """
+    rows = []
+    for pillar in tree['pillars']:
+        for area in pillar['areas']:
+            rows.append({'type': 'area', 'name': area['name'], 'value': area['assessment'], 'source': None})
+            for indicator in area['indicators']:
+                rows.append({
+                    'type': 'indicator',
+                    'name': indicator['name'],
+                    'value': indicator['assessment'],
+                    'source': indicator['source'],
+                })
+                for metric in indicator['metrics'] or []:
+                    rows.append({'type': 'metric', 'name': metric['name'], 'value': metric['value'], 'source': None})
+    return rows
+
+
+def encode_msgpack(tree: Dict[str, Any]) -> bytes:
+    """The same nested document as the JSON body, as MessagePack"""
+    import msgpack
+
+    return msgpack.packb(tree, use_bin_type=True)
+
+
+def encode_ndjson(tree: Dict[str, Any]) -> bytes:
+    """One JSON object per line and per row, each carrying its country and year"""
+    metadata = tree['metadata']
+    lines = [dumps({**metadata, **row}) for row in flatten(tree)]
+    return b'\n'.join(lines) + b'\n' if lines else b''
+
+
+def encode_columnar(tree: Dict[str, Any]) -> bytes:
+    """The rows as parallel arrays, so every key appears once"""
+    rows = flatten(tree)
+    return dumps({
+        'metadata': tree['metadata'],
+        'columns': {field: [row[field] for row in rows] for field in ROW_FIELDS},
+    })
+
+
+ENCODERS: Dict[str, Callable[[Dict[str, Any]], bytes]] = {
+    'msgpack': encode_msgpack,
+    'ndjson': encode_ndjson,
+    'columnar': encode_columnar,
+}
+
+
+def available_formats() -> List[str]:
+    formats = list(FORMAT_MEDIA_TYPES)
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        formats.remove('msgpack')
+    return formats
+
+
+def negotiate_format(accept: Optional[str], formats: Optional[List[str]] = None) -> Optional[str]:
+    """
+    The preferred of ``formats`` (by default, the available ones) for an
+    ``Accept`` header, or None if it accepts none of them. A missing
+    header, ``*/*`` or ``application/*`` get JSON.
+    """
+    if not accept:
+        return 'json'
+    formats = available_formats() if formats is None else formats
+    by_media_type = {FORMAT_MEDIA_TYPES[fmt]: fmt for fmt in formats}
+
+    best, best_quality = None, 0.0
+    for position, item in enumerate(accept.split(',')):
+        media_type, _, params = item.strip().partition(';')
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        if media_type in by_media_type:
+            fmt = by_media_type[media_type]
+        elif media_type in ('*/*', 'application/*'):
+            fmt = 'json'
+        else:
+            continue
+        # Ties go to the first listed
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
@@ -1,4 +1,5 @@
-from typing import List, Optional
+from datetime import date
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class Metric(BaseModel):
@@ -28,6 +29,94 @@ class ResponseData(BaseModel):
     metadata: Metadata
     pillars: List[Pillar] = []
 
+class CountryInfo(BaseModel):
+    name: str
+    iso_code: Optional[str] = None
+    region: Optional[str] = None
+    world_bank_lending_group: Optional[str] = None
+    imf_fiscal_monitor_category: Optional[str] = None
+    unfccc_party_type: Optional[str] = None
+    assessment_years: List[int] = []
+
+class CountrySuggestion(BaseModel):
+    name: str
+    iso_code: Optional[str] = None
+
+class IndicatorInfo(BaseModel):
+    code: str
+    type: str
+    text: Optional[str] = None
+    units: Optional[str] = None
+
+class TrendMetric(BaseModel):
+    name: str
+    value: Optional[str] = None
+    source: Optional[str] = None
+    year: Optional[int] = None
+
+class TrendSeries(BaseModel):
+    emissions_metric: str
+    emissions_boundary: str
+    units: Optional[str] = None
+    assessment_date: Optional[date] = None
+    publication_date: Optional[date] = None
+    last_historical_year: Optional[int] = None
+    metrics: List[TrendMetric] = []
+    years: List[int] = []
+    values: List[float] = []
+
+class BenchmarkSeries(BaseModel):
+    emissions_metric: str
+    emissions_boundary: str
+    units: Optional[str] = None
+    benchmark_type: str
+    publication_date: Optional[date] = None
+    years: List[int] = []
+    values: List[float] = []
+
+class BatchItem(BaseModel):
+    country: str = "*"  # "*" matches every country
+    assessment_year: Optional[int] = None  # None matches every year
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+class BatchResult(BaseModel):
+    country: str
+    assessment_year: Optional[int] = None
+    status: str  # "ok" or "not_found"
+    data: Optional[ResponseData] = None
+    message: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult] = []
+
+class Change(BaseModel):
+    code: str
+    type: str  # "area", "indicator" or "metric"
+    path: str  # the assessment column, e.g. "indicator EP.1.a"
+    before: Optional[str] = None
+    after: Optional[str] = None
+
+class DiffResponse(BaseModel):
+    country: str
+    from_year: int
+    to_year: int
+    changes: List[Change] = []
+
+class CountryRank(BaseModel):
+    country: str
+    matches: int
+    assessed: int
+    share: float
+
+class QueryResponse(BaseModel):
+    matches: int
+    assessed: int
+    countries: int
+    groups: Optional[List[Dict[str, Any]]] = None
+    ranking: List[CountryRank] = []
+
 class ErrorResponse(BaseModel):
     message: str
     details: dict = {}
@@ -0,0 +1,118 @@
+"""Cross-country queries over the assessed cells of the long table."""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_FIELDS = ['country', 'type', 'pillar', 'code', 'value']
+QUERY_FIELDS = ['country', 'year', 'type', 'pillar', 'code', 'value']
+CELL_TYPES = ['area', 'indicator', 'metric']
+RANK_BY = ['matches', 'share']
+
+
+class QueryTable:
+    """
+    The assessed (non-empty) cells of the melted table, dictionary-encoded.
+
+    Every text column is a categorical, so a filter is resolved against the
+    few distinct values once and then applied to the whole table as an
+    integer comparison, and per-country counts are a single ``bincount``.
+    """
+
+    def __init__(self, melted_df: pd.DataFrame):
+        assessed = melted_df[melted_df['value'].notna().to_numpy()]
+        self.frame = pd.DataFrame({
+            'country': pd.Categorical(assessed['Country']),
+            'year': assessed['Assessment date'].dt.year.to_numpy(dtype=np.int16),
+            'type': pd.Categorical(assessed['type']),
+            'pillar': pd.Categorical(assessed['pillar']),
+            'code': pd.Categorical(assessed['code']),
+            'value': pd.Categorical(assessed['value']),
+        })
+        self._codes = {field: self.frame[field].cat.codes.to_numpy() for field in CATEGORY_FIELDS}
+        self._years = self.frame['year'].to_numpy()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def _isin(self, field: str, categories: Sequence[str]) -> np.ndarray:
+        wanted = self.frame[field].cat.categories.get_indexer(list(categories))
+        return np.isin(self._codes[field], wanted[wanted >= 0])
+
+    def _code_mask(self, codes: Sequence[str]) -> np.ndarray:
+        # A code matches itself and everything below it: "CP.3" selects the
+        # area CP.3 and its indicators and metrics, "EP" the whole pillar
+        categories = self.frame['code'].cat.categories
+        matching = np.zeros(len(categories), dtype=bool)
+        for code in codes:
+            matching |= (categories == code) | categories.str.startswith(code + '.')
+        return np.isin(self._codes['code'], np.flatnonzero(matching))
+
+    def select(
+        self,
+        codes: Optional[Sequence[str]] = None,
+        types: Optional[Sequence[str]] = None,
+        years: Optional[Sequence[int]] = None,
+        countries: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """Boolean mask of the cells matching every given filter"""
+        mask = np.ones(len(self.frame), dtype=bool)
+        if codes:
+            mask &= self._code_mask(codes)
+        if types:
+            mask &= self._isin('type', types)
+        if years:
+            mask &= np.isin(self._years, list(years))
+        if countries:
+            mask &= self._isin('country', countries)
+        return mask
+
+    def query(
+        self,
+        codes: Optional[Sequence[str]] = None,
+        types: Optional[Sequence[str]] = None,
+        values: Optional[Sequence[str]] = None,
+        years: Optional[Sequence[int]] = None,
+        countries: Optional[Sequence[str]] = None,
+        group_by: Optional[Sequence[str]] = None,
+        rank_by: str = 'matches',
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Count the cells matching the filters, grouped and ranked by country.
+
+        ``assessed`` counts the cells matching every filter except ``values``,
+        so a country's ``share`` is e.g. the fraction of its selected
+        indicators assessed "Yes".
+        """
+        scope = self.select(codes, types, years, countries)
+        matched = scope & self._isin('value', values) if values else scope
+
+        country_codes = self._codes['country']
+        n_countries = len(self.frame['country'].cat.categories)
+        matches = np.bincount(country_codes[matched], minlength=n_countries)
+        assessed = np.bincount(country_codes[scope], minlength=n_countries)
+
+        shares = np.divide(matches, assessed, out=np.zeros(n_countries), where=assessed > 0)
+
+        # Highest first; categories are sorted, so ties stay alphabetical
+        order = np.argsort(-(shares if rank_by == 'share' else matches), kind='stable')
+        order = order[matches[order] > 0][:limit]
+        names = self.frame['country'].cat.categories[order]
+        ranking = [
+            {'country': name, 'matches': int(count), 'assessed': int(total), 'share': round(float(share), 4)}
+            for name, count, total, share in zip(names, matches[order], assessed[order], shares[order])
+        ]
+
+        groups = None
+        if group_by:
+            sizes = self.frame[matched].groupby(list(dict.fromkeys(group_by)), observed=True).size()
+            groups = sizes[sizes > 0].reset_index(name='count').to_dict('records')
+
+        return {
+            'matches': int(matched.sum()),
+            'assessed': int(scope.sum()),
+            'countries': int((matches > 0).sum()),
+            'groups': groups,
+            'ranking': ranking,
+        }
@@ -0,0 +1,123 @@
+import json
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from .formats import ENCODERS, FORMAT_MEDIA_TYPES
+from .query import QueryTable
+from .timeseries import SeriesMatrix
+from .transformers import (
+    transform_country_rows, transform_all_countries, melt_assessment_data,
+    extract_sources, view_path_mask, CodedColumns, TreeView, FULL_VIEW, build_country_info, build_indicator_info, build_trend_series, build_benchmark_series
+)
+from common.datastore import Dataset, get_dataset, register_builder
+from common.index import CountryYearIndex
+from common.metrics import timed
+from common.offload import SingleFlight
+from common.response_cache import CachedResponse, ResponseCache
+
+class V3State:
+    """Everything v3 derives from one data release."""
+
+    def __init__(self, dataset: Dataset):
+        self.melted_df = melt_assessment_data(dataset.assessments)
+        self.melted_index = CountryYearIndex(self.melted_df)
+        self.sources = extract_sources(dataset.assessments)
+
+        # Rendered /country-metrics bodies, keyed on (country, year), warmed with
+        # every tree built in a single grouped pass over melted_df. The cache
+        # belongs to this release, so it is dropped when a reload swaps it out.
+        self.metrics_cache = ResponseCache("v3_country_metrics")
+        for key, response in transform_all_countries(self.melted_df, self.sources).items():
+            self.metrics_cache.put(key, response.model_dump_json().encode())
+        # Concurrent misses for the same body share one render
+        self.render_flights = SingleFlight("v3_country_metrics")
+
+        self.query_table = QueryTable(self.melted_df)
+
+        # Row positions of every (country, year) and the metric path code of
+        # every row, so a partial tree selects only the rows it needs
+        self._positions = self.melted_index.positions()
+        self._path_codes = self.melted_df['metric_path'].cat.codes.to_numpy()
+        self._columns = CodedColumns(self.melted_df)
+        self._view_masks: Dict[TreeView, np.ndarray] = {}
+
+        # Models for the tables joined on country name and indicator code,
+        # built once per release from the dataset's prebuilt slices
+        years = {country: self.melted_index.years(country) for country in self.melted_index.countries}
+        self.country_info = build_country_info(dataset.countries, years)
+        self.indicator_info = build_indicator_info(dataset.indicators)
+        self.trends = {}
+        for country, rows in dataset.trends_index.items():
+            rows = rows.sort_values('Assessment date', kind='stable')
+            self.trends[country] = SeriesMatrix(rows, build_trend_series(rows))
+        self.benchmarks = {
+            country: build_benchmark_series(rows) for country, rows in dataset.benchmarks_index.items()
+        }
+
+    @staticmethod
+    def metrics_key(country: str, assessment_year: int, fmt: str, view: TreeView) -> Hashable:
+        if view == FULL_VIEW:
+            return (country, assessment_year) if fmt == 'json' else (country, assessment_year, fmt)
+        return (country, assessment_year, fmt, view)
+
+    def cached_country_metrics(
+        self, country: str, assessment_year: int, fmt: str = 'json', view: TreeView = FULL_VIEW
+    ) -> Optional[CachedResponse]:
+        """The rendered /country-metrics body in ``fmt`` if it is already cached"""
+        with timed("v3", "lookup"):
+            return self.metrics_cache.get(self.metrics_key(country, assessment_year, fmt, view))
+
+    def _view_positions(self, country: str, assessment_year: int, view: TreeView) -> Optional[np.ndarray]:
+        """Positions of the melted rows of one country and year that a ``view`` tree needs"""
+        positions = self._positions.get((country, assessment_year))
+        if positions is None:
+            return None
+        mask = self._view_masks.get(view)
+        if mask is None:
+            mask = self._view_masks[view] = view_path_mask(self.melted_df['metric_path'].cat.categories, view)
+        return positions[mask[self._path_codes[positions]]]
+
+    def render_country_metrics(
+        self, country: str, assessment_year: int, fmt: str = 'json', view: TreeView = FULL_VIEW
+    ) -> Optional[CachedResponse]:
+        """Build, render and cache the /country-metrics body, or None if there is no data"""
+        cache_key = self.metrics_key(country, assessment_year, fmt, view)
+        if fmt != 'json':
+            # Other formats are re-encodings of the JSON document
+            entry = self.country_metrics_entry(country, assessment_year, view=view)
+            if entry is None:
+                return None
+            with timed("v3", "serialize"):
+                body = ENCODERS[fmt](json.loads(entry.body))
+            return self.metrics_cache.put(cache_key, body, FORMAT_MEDIA_TYPES[fmt])
+
+        sources = self.sources.get((country, assessment_year)) if view.include_sources else None
+        # Only the rows of the requested pillars and levels are selected, so
+        # the transform only ever sees what it returns
+        with timed("v3", "lookup"):
+            positions = self._view_positions(country, assessment_year, view)
+        if positions is None:
+            return None
+        with timed("v3", "transform"):
+            response = transform_country_rows(self._columns, positions, country, assessment_year, sources)
+        with timed("v3", "serialize"):
+            body = response.model_dump_json().encode()
+        return self.metrics_cache.put(cache_key, body)
+
+    def country_metrics_entry(
+        self, country: str, assessment_year: int, fmt: str = 'json', view: TreeView = FULL_VIEW
+    ) -> Optional[CachedResponse]:
+        """The rendered /country-metrics body for one country and year, or None"""
+        entry = self.cached_country_metrics(country, assessment_year, fmt, view)
+        if entry is not None:
+            return entry
+        return self.render_country_metrics(country, assessment_year, fmt, view)
+
+    def country_metrics_entries(self, keys: List[Tuple[str, int]]) -> List[Optional[CachedResponse]]:
+        """:meth:`country_metrics_entry` of every (country, year) in ``keys``, in one blocking call"""
+        return [self.country_metrics_entry(country, assessment_year) for country, assessment_year in keys]
+
+register_builder("v3", V3State)
+
+def get_state() -> V3State:
+    """The v3 state of the release currently being served"""
+    return get_dataset().derived["v3"]
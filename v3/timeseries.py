@@ -0,0 +1,104 @@
+"""NumPy-backed time series with server-side range filtering and downsampling."""
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets point reduction.
+
+    Returns the indices of at most ``threshold`` points that preserve the
+    visual shape of the series; the first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold <= 2:
+        return np.array([0, n - 1])[:max(threshold, 1)]
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def bucket(years: np.ndarray, values: np.ndarray, step: int, agg: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce a series to one point per ``step``-year bucket.
+
+    The buckets start at the first year of the series. ``agg`` is ``first``
+    (the first point in each bucket) or ``mean`` (the bucket's mean value,
+    reported at the bucket's first year).
+    """
+    buckets = (years - years[0]) // step
+    _, starts = np.unique(buckets, return_index=True)
+    if agg == "mean":
+        sums = np.add.reduceat(values, starts)
+        counts = np.diff(np.append(starts, len(values)))
+        return years[starts], sums / counts
+    return years[starts], values[starts]
+
+class SeriesMatrix:
+    """
+    Several yearly series stored as one NaN-padded 2D float array.
+
+    ``models`` holds one response model per row, each carrying the full
+    series in its ``years``/``values`` fields; filtered requests copy the
+    model with the reduced arrays.
+    """
+
+    def __init__(self, frame: pd.DataFrame, models: List[BaseModel]):
+        year_columns = [col for col in frame.columns if col.isdigit()]
+        self.years = np.array([int(col) for col in year_columns], dtype=np.int64)
+        self.values = frame[year_columns].to_numpy(dtype=np.float64)
+        self.models = models
+
+    def select(
+        self,
+        rows: Optional[List[int]] = None,
+        from_year: Optional[int] = None,
+        to_year: Optional[int] = None,
+        step: Optional[int] = None,
+        agg: str = "first",
+        max_points: Optional[int] = None
+    ) -> List[BaseModel]:
+        rows = range(len(self.models)) if rows is None else rows
+        if from_year is None and to_year is None and step is None and max_points is None:
+            return [self.models[row] for row in rows]
+
+        in_range = np.ones(len(self.years), dtype=bool)
+        if from_year is not None:
+            in_range &= self.years >= from_year
+        if to_year is not None:
+            in_range &= self.years <= to_year
+
+        result = []
+        for row in rows:
+            values = self.values[row]
+            present = in_range & ~np.isnan(values)
+            years, values = self.years[present], values[present]
+
+            if len(years) and step is not None and step > 1:
+                years, values = bucket(years, values, step, agg)
+            if max_points is not None and len(years) > max_points:
+                keep = lttb(years.astype(np.float64), values, max_points)
+                years, values = years[keep], values[keep]
+
+            result.append(self.models[row].model_copy(
+                update={"years": years.tolist(), "values": values.tolist()}
+            ))
+        return result
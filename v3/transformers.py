@@ -1,130 +1,403 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+import numpy as np
 import pandas as pd
-from .models import ResponseData, Metadata, Pillar, Area, Indicator, Metric
+from .models import (
+    ResponseData, Metadata, Pillar, Area, Indicator, Metric,
+    CountryInfo, IndicatorInfo, TrendMetric, TrendSeries, BenchmarkSeries, Change
+)
+
+ID_VARS = ['Country', 'Assessment date', 'Publication date']
+PATH_COLUMNS = ['type', 'code', 'pillar', 'area', 'indicator', 'metric']
+PILLAR_CODES = ['EP', 'CP', 'CF']
+# Row types included at each depth of the tree
+DEPTHS = {
+    'area': ('area',),
+    'indicator': ('area', 'indicator'),
+    'metric': ('area', 'indicator', 'metric'),
+}
+
+class TreeView(NamedTuple):
+    """The part of the tree to build: which pillars, how deep, and whether with sources"""
+    pillars: Tuple[str, ...] = tuple(PILLAR_CODES)
+    depth: str = 'metric'
+    include_sources: bool = True
+
+FULL_VIEW = TreeView()
+
+def parse_metric_columns(columns) -> pd.DataFrame:
+    """
+    Parse the wide-format column names once, at the column level.
+
+    Returns one row per area/indicator/metric column (indexed by the
+    original column name) with its type, code, pillar, area, indicator and
+    metric components. Columns that are not assessment values are dropped.
+    """
+    names = pd.Series(
+        [str(col) for col in columns if not str(col).startswith('source') and col not in ID_VARS],
+        dtype=object
+    )
+    parsed = names.str.extract(r'(area|indicator|metric)\s+([A-Z]{2}\.\d+(?:\.[a-z](?:\.i)?)?)')
+    parsed.columns = ['type', 'code']
+    components = parsed['code'].str.extract(r'([A-Z]{2})\.(\d+)(?:\.([a-z])(?:\.([i]))?)?')
+    components.columns = ['pillar', 'area', 'indicator', 'metric']
+    parsed = pd.concat([parsed, components], axis=1)
+    parsed.index = pd.Index(names, name='metric_path')
+    return parsed.dropna(subset=['type'])
+
+def _categorical_text(columns: List[np.ndarray]) -> pd.Categorical:
+    """
+    The cells of ``columns``, one after the other, as a categorical of their
+    text; missing cells are NaN.
+
+    Distinct cells are found per column, where they all share a type (so
+    ``2021`` and ``2021.0`` keep their own text), and only those are
+    converted to text.
+    """
+    codes, texts = [], []
+    for values in columns:
+        column_codes, uniques = pd.factorize(values)
+        codes.append(np.where(column_codes >= 0, column_codes + len(texts), -1))
+        texts.extend(str(value) for value in uniques)
+
+    text_codes, categories = pd.factorize(np.array(texts, dtype=object), sort=True)
+    codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.intp)
+    if len(text_codes):
+        codes = np.where(codes >= 0, text_codes[np.maximum(codes, 0)], -1)
+    return pd.Categorical.from_codes(codes, categories)
+
+def view_path_mask(paths: pd.Index, view: TreeView) -> np.ndarray:
+    """Which of the metric paths ``paths`` a tree restricted to ``view`` needs"""
+    columns = parse_metric_columns(paths).reindex(paths)
+    return (columns['pillar'].isin(view.pillars) & columns['type'].isin(DEPTHS[view.depth])).to_numpy()
 
 def melt_assessment_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Melt the wide-format assessment data into long format."""
-    # Convert all column names to strings
+    """
+    Melt the wide-format assessment data into long format.
+
+    Rows come out column by column, in the same order as ``pd.melt``. Each
+    value is joined with its ``source *`` cell, if the column has one.
+
+    The text columns repeat a few distinct strings on every row, so they
+    are categoricals: integer codes into a dictionary of the distinct
+    values, decoded only when a response is rendered. ``value`` and
+    ``source`` hold the text of the cell, which is how every response
+    renders them.
+    """
     df.columns = df.columns.astype(str)
-    
-    id_vars = ['Country', 'Assessment date', 'Publication date']
-    
-    # Keep source columns in original format for later use
-    source_columns = [col for col in df.columns if col.startswith('source')]
-    sources_df = df[['Country', 'Assessment date'] + source_columns]
-    
-    # Filter columns for melting (excluding sources)
-    value_vars = [col for col in df.columns if not col.startswith('source') and col not in id_vars]
-    
-    # Melt the dataframe
-    melted_df = pd.melt(
-        df,
-        id_vars=id_vars,
-        value_vars=value_vars,
-        var_name='metric_path',
-        value_name='value'
-    )
-    
-    # Extract components from metric_path
-    melted_df[['type', 'code']] = melted_df['metric_path'].str.extract(r'(area|indicator|metric)\s+([A-Z]{2}\.\d+(?:\.[a-z](?:\.i)?)?)')
-    melted_df[['pillar', 'area', 'indicator', 'metric']] = melted_df['code'].str.extract(r'([A-Z]{2})\.(\d+)(?:\.([a-z])(?:\.([i]))?)?')
-    
-    # Filter out any rows where type is None
-    melted_df = melted_df.dropna(subset=['type'])
-    
-    # Add sources to the melted dataframe
-    melted_df = pd.merge(
-        melted_df,
-        sources_df,
-        on=['Country', 'Assessment date'],
-        how='left'
-    )
-    
-    return melted_df
+    columns = parse_metric_columns(df.columns)
+    n_rows, n_columns = len(df), len(columns)
+    column_codes = np.repeat(np.arange(n_columns), n_rows)
 
-def transform_country_data(df: pd.DataFrame, country: str, year: int) -> ResponseData:
-    """Transform melted data into ResponseData structure."""
-    metadata = Metadata(
-        country=country,
-        assessment_year=year
-    )
-    
-    pillars = []
-    pillar_codes = ['EP', 'CP', 'CF']
-    
-    for pillar_code in pillar_codes:
-        pillar_data = df[df['pillar'] == pillar_code]
-        if pillar_data.empty:
+    country = pd.Categorical(df['Country'])
+    data = {'Country': pd.Categorical.from_codes(np.tile(country.codes, n_columns), country.categories)}
+    for col in ID_VARS[1:]:
+        data[col] = np.tile(df[col].to_numpy(), n_columns)
+    data['metric_path'] = pd.Categorical.from_codes(column_codes, columns.index)
+    data['value'] = _categorical_text([df[path].to_numpy() for path in columns.index])
+    for col in PATH_COLUMNS:
+        codes, categories = pd.factorize(columns[col], sort=True)
+        data[col] = pd.Categorical.from_codes(np.repeat(codes, n_rows), categories)
+
+    no_source = np.full(n_rows, None, dtype=object)
+    data['source'] = _categorical_text([
+        df[f'source {path}'].to_numpy() if f'source {path}' in df.columns else no_source
+        for path in columns.index
+    ])
+
+    return pd.DataFrame(data)
+
+def extract_sources(df: pd.DataFrame) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    """
+    Build a lookup of the non-empty ``source *`` cells for each assessment.
+
+    Keyed on (country, assessment year); the inner dict maps the sourced
+    column (e.g. ``"indicator EP.1.a"``) to its source.
+    """
+    source_columns = [col for col in df.columns if str(col).startswith('source')]
+    keys = zip(df['Country'], df['Assessment date'].dt.year)
+    rows = df[source_columns].to_numpy()
+
+    sources = {}
+    for (country, year), row in zip(keys, rows):
+        sources[(country, int(year))] = {
+            col.removeprefix('source '): value
+            for col, value in zip(source_columns, row)
+            if pd.notna(value)
+        }
+    return sources
+
+def _build_pillars(
+    types: np.ndarray,
+    pillars: np.ndarray,
+    areas: np.ndarray,
+    indicators: np.ndarray,
+    metrics: np.ndarray,
+    values: np.ndarray,
+    sources: Optional[Dict[str, Any]]
+) -> List[Pillar]:
+    """Assemble the Pillar/Area/Indicator/Metric tree in a single pass over the rows."""
+    sources = sources or {}
+    area_numbers: Dict[str, set] = {pillar_code: set() for pillar_code in PILLAR_CODES}
+    area_values: Dict[Tuple[str, str], Any] = {}
+    area_indicators: Dict[Tuple[str, str], List[Tuple[str, Any]]] = {}
+    indicator_metrics: Dict[Tuple[str, str, str], List[Metric]] = {}
+
+    for row_type, pillar_code, area_num, ind, metric, value in zip(
+        types, pillars, areas, indicators, metrics, values
+    ):
+        if pillar_code not in area_numbers:
             continue
-            
-        areas = []
-        unique_areas = pillar_data['area'].unique()
-        
-        for area_num in sorted(unique_areas):
-            area_data = pillar_data[pillar_data['area'] == area_num]
-            area_value = None
-            area_value_series = area_data[
-                (area_data['type'] == 'area') &
-                (area_data['pillar'] == pillar_code)
-            ]['value']
-            
-            if not area_value_series.empty and pd.notna(area_value_series.iloc[0]):
-                area_value = str(area_value_series.iloc[0])
-            
+        area_numbers[pillar_code].add(area_num)
+        key = (pillar_code, area_num)
+
+        if row_type == 'area':
+            area_values.setdefault(key, value)
+        elif row_type == 'indicator':
+            area_indicators.setdefault(key, []).append((ind, value))
+        elif row_type == 'metric' and pd.notna(value):
+            indicator_metrics.setdefault((pillar_code, area_num, ind), []).append(
+                Metric(name=f"{pillar_code}.{area_num}.{ind}.{metric}", value=str(value))
+            )
+
+    result = []
+    for pillar_code in PILLAR_CODES:
+        pillar_areas = []
+        for area_num in sorted(area_numbers[pillar_code]):
+            key = (pillar_code, area_num)
+            area_value = area_values.get(key)
+
             area = Area(
                 name=f"{pillar_code}.{area_num}",
-                assessment=area_value,
+                assessment=str(area_value) if pd.notna(area_value) else None,
                 indicators=[]
             )
-            
-            # Process indicators for this area
-            indicators_data = area_data[area_data['type'] == 'indicator']
-            for _, ind_row in indicators_data.iterrows():
-                indicator_value = None
-                if pd.notna(ind_row['value']):
-                    indicator_value = str(ind_row['value'])
-                
-                # Get source for this indicator if available
-                source_col = f"source indicator {pillar_code}.{area_num}.{ind_row['indicator']}"
-                source_value = None
-                if source_col in df.columns and pd.notna(ind_row[source_col]):
-                    source_value = str(ind_row[source_col])
-                
-                indicator = Indicator(
-                    name=f"{pillar_code}.{area_num}.{ind_row['indicator']}",
-                    assessment=indicator_value,
-                    metrics=[],
-                    source=source_value
-                )
-                
-                # Check for corresponding metrics
-                metric_data = area_data[
-                    (area_data['type'] == 'metric') &
-                    (area_data['indicator'] == ind_row['indicator'])
-                ]
-                
-                # Process all metrics for this indicator
-                for _, metric_row in metric_data.iterrows():
-                    if pd.notna(metric_row['value']):
-                        metric = Metric(
-                            name=f"{pillar_code}.{area_num}.{ind_row['indicator']}.{metric_row['metric']}",
-                            value=str(metric_row['value'])
-                        )
-                        indicator.metrics.append(metric)
-                
-                # Set metrics to None if no metrics were found
-                if not indicator.metrics:
-                    indicator.metrics = None
-                
-                area.indicators.append(indicator)
-            
+
+            for ind, ind_value in area_indicators.get(key, []):
+                source_value = sources.get(f"indicator {pillar_code}.{area_num}.{ind}")
+                area.indicators.append(Indicator(
+                    name=f"{pillar_code}.{area_num}.{ind}",
+                    assessment=str(ind_value) if pd.notna(ind_value) else None,
+                    metrics=list(indicator_metrics.get((pillar_code, area_num, ind), [])) or None,
+                    source=str(source_value) if source_value is not None else None
+                ))
+
             if area.indicators or area.assessment:
-                areas.append(area)
-        
-        if areas:
-            pillars.append(Pillar(name=pillar_code, areas=areas))
-    
+                pillar_areas.append(area)
+
+        if pillar_areas:
+            result.append(Pillar(name=pillar_code, areas=pillar_areas))
+
+    return result
+
+TREE_COLUMNS = ['type', 'pillar', 'area', 'indicator', 'metric', 'value']
+
+def _column_arrays(df: pd.DataFrame) -> List[np.ndarray]:
+    return [df[col].to_numpy() for col in TREE_COLUMNS]
+
+class CodedColumns:
+    """
+    The tree columns of the melted table, decoded per row position.
+
+    Rows are read straight from the categorical codes, so selecting the
+    few rows of a partial tree costs two small ``take``s per column rather
+    than slicing the frame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._columns = []
+        for col in TREE_COLUMNS:
+            values = df[col].array
+            # Code -1 (missing) indexes the NaN appended at the end
+            categories = np.append(values.categories.to_numpy(dtype=object), np.nan)
+            self._columns.append((values.codes, categories))
+
+    def take(self, positions: np.ndarray) -> List[np.ndarray]:
+        return [categories[codes[positions]] for codes, categories in self._columns]
+
+def transform_country_data(
+    df: pd.DataFrame,
+    country: str,
+    year: int,
+    sources: Optional[Dict[str, Any]] = None
+) -> ResponseData:
+    """Transform melted data for one country and year into ResponseData structure."""
+    metadata = Metadata(
+        country=country,
+        assessment_year=year
+    )
+
     return ResponseData(
         metadata=metadata,
-        pillars=pillars
+        pillars=_build_pillars(*_column_arrays(df), sources)
+    )
+
+def transform_country_rows(
+    columns: CodedColumns,
+    positions: np.ndarray,
+    country: str,
+    year: int,
+    sources: Optional[Dict[str, Any]] = None
+) -> ResponseData:
+    """Transform the melted rows at ``positions`` into ResponseData structure."""
+    return ResponseData(
+        metadata=Metadata(country=country, assessment_year=year),
+        pillars=_build_pillars(*columns.take(positions), sources)
     )
+
+def transform_all_countries(
+    melted_df: pd.DataFrame,
+    sources: Optional[Dict[Tuple[str, int], Dict[str, Any]]] = None
+) -> Dict[Tuple[str, int], ResponseData]:
+    """
+    Build the ResponseData tree of every (country, year) in one grouped pass.
+
+    The melted frame is grouped once and each group is assembled straight
+    from array slices, without creating intermediate DataFrames.
+    """
+    sources = sources or {}
+    years = melted_df['Assessment date'].dt.year.rename('year')
+    groups = melted_df.groupby([melted_df['Country'], years], observed=True, sort=False).indices
+    arrays = _column_arrays(melted_df)
+
+    results = {}
+    for (country, year), positions in groups.items():
+        key = (country, int(year))
+        results[key] = ResponseData(
+            metadata=Metadata(country=country, assessment_year=key[1]),
+            pillars=_build_pillars(*(array[positions] for array in arrays), sources.get(key))
+        )
+    return results
+
+def diff_country_data(before: pd.DataFrame, after: pd.DataFrame) -> List[Change]:
+    """
+    The cells whose value differs between two melted slices of one country.
+
+    Both slices share the melted table's dictionaries, so they are aligned
+    on the metric path code in one scatter and compared as value codes.
+    Cells missing from a slice count as empty. Changes come out in column
+    order.
+    """
+    paths = before['metric_path'].cat.categories
+    aligned = np.full((2, len(paths)), -1, dtype=np.int64)
+    for row, df in enumerate((before, after)):
+        aligned[row, df['metric_path'].cat.codes.to_numpy()] = df['value'].cat.codes.to_numpy()
+
+    changed = np.flatnonzero(aligned[0] != aligned[1])
+    values = before['value'].cat.categories
+    columns = parse_metric_columns(paths[changed])
+    return [
+        Change(
+            code=code,
+            type=cell_type,
+            path=path,
+            before=values[old] if old >= 0 else None,
+            after=values[new] if new >= 0 else None
+        )
+        for path, cell_type, code, old, new in zip(
+            paths[changed], columns['type'], columns['code'], aligned[0, changed], aligned[1, changed]
+        )
+    ]
+
+COUNTRY_INFO_COLUMNS = {
+    'Country ISO code': 'iso_code',
+    'Region': 'region',
+    'World Bank lending group': 'world_bank_lending_group',
+    'International Monetary Fund fiscal monitor category': 'imf_fiscal_monitor_category',
+    'Type of Party to the United Nations Framework Convention on Climate Change': 'unfccc_party_type',
+}
+
+def _text(value) -> Optional[str]:
+    """Cell as text; Excel's leading apostrophe text marker is dropped."""
+    if value is None or pd.isna(value):
+        return None
+    return str(value).removeprefix("'")
+
+def _int(value) -> Optional[int]:
+    return None if value is None or pd.isna(value) else int(value)
+
+def _date(value):
+    return None if value is None or pd.isna(value) else value.date()
+
+def _year_columns(df: pd.DataFrame) -> List[str]:
+    return [col for col in df.columns if col.isdigit()]
+
+def _series_arrays(row: Dict[str, Any], year_columns: List[str]) -> Tuple[List[int], List[float]]:
+    years, values = [], []
+    for col in year_columns:
+        if pd.notna(row[col]):
+            years.append(int(col))
+            values.append(float(row[col]))
+    return years, values
+
+def build_country_info(countries: pd.DataFrame, years: Dict[str, List[int]]) -> Dict[str, CountryInfo]:
+    """Country metadata keyed on name, joined with the assessment years available."""
+    result = {}
+    for row in countries.to_dict('records'):
+        result[row['Name']] = CountryInfo(
+            name=row['Name'],
+            assessment_years=years.get(row['Name'], []),
+            **{field: _text(row.get(col)) for col, field in COUNTRY_INFO_COLUMNS.items()}
+        )
+    return result
+
+def build_indicator_info(indicators: pd.DataFrame) -> Dict[str, IndicatorInfo]:
+    """Indicator definitions keyed on code (EP, EP.1, EP.1.a, EP.1.a.i, ...)."""
+    return {
+        row['Code']: IndicatorInfo(
+            code=row['Code'],
+            type=row['Type'],
+            text=_text(row.get('Text')),
+            units=_text(row.get('Units or response type'))
+        )
+        for row in indicators.to_dict('records')
+    }
+
+def build_trend_series(trends: pd.DataFrame) -> List[TrendSeries]:
+    """The emissions trend and pathway series of one country, oldest assessment first."""
+    year_columns = _year_columns(trends)
+    metric_columns = [col for col in trends.columns if col.startswith('metric ')]
+
+    series = []
+    for row in trends.sort_values('Assessment date', kind='stable').to_dict('records'):
+        metrics = []
+        for col in metric_columns:
+            name = col.removeprefix('metric ')
+            base = name.split(' ')[0]
+            metrics.append(TrendMetric(
+                name=name,
+                value=_text(row[col]),
+                source=_text(row.get(f'source metric {base}')),
+                year=_int(row.get(f'year metric {base}'))
+            ))
+
+        years, values = _series_arrays(row, year_columns)
+        series.append(TrendSeries(
+            emissions_metric=row['Emissions metric'],
+            emissions_boundary=row['Emissions boundary'],
+            units=_text(row.get('Units')),
+            assessment_date=_date(row.get('Assessment date')),
+            publication_date=_date(row.get('Publication date')),
+            last_historical_year=_int(row.get('Last historical year')),
+            metrics=metrics,
+            years=years,
+            values=values
+        ))
+    return series
+
+def build_benchmark_series(benchmarks: pd.DataFrame) -> List[BenchmarkSeries]:
+    """The emissions benchmark series of one country."""
+    year_columns = _year_columns(benchmarks)
+
+    series = []
+    for row in benchmarks.to_dict('records'):
+        years, values = _series_arrays(row, year_columns)
+        series.append(BenchmarkSeries(
+            emissions_metric=row['Emissions metric'],
+            emissions_boundary=row['Emissions boundary'],
+            units=_text(row.get('Units')),
+            benchmark_type=row['Benchmark type'],
+            publication_date=_date(row.get('Publication date')),
+            years=years,
+            values=values
+        ))
+    return series